@@ -0,0 +1,127 @@
+import math
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
+from rest_framework.pagination import _positive_int
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import replace_query_param
+
+from book.authentication import StatelessJSONWebTokenAuthentication
+from book.filters import BookFilterBackend
+from book.models import Book, Category, Company
+from book.serializers import BookSerializer, CategorySerializer, CompanySerializer
+from book.throttling import ReadWriteThrottle
+
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+async def alist(queryset, chunk_size=2000):
+    """
+    Evaluate ``queryset`` without blocking the event loop, using the async
+    ORM (Django 4.1+) when it is available.
+    """
+    if hasattr(queryset, 'aiterator'):
+        return [obj async for obj in queryset.aiterator(chunk_size=chunk_size)]
+
+    return await sync_to_async(list)(queryset)
+
+
+async def aget(queryset, **kwargs):
+    if hasattr(queryset, 'aget'):
+        return await queryset.aget(**kwargs)
+
+    return await sync_to_async(queryset.get)(**kwargs)
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def check_request(request):
+    """
+    Authenticate and throttle ``request`` the way the viewsets do. Returns
+    an error response, or None when the request may go ahead.
+    """
+    if request.method != 'GET':
+        return render({'detail': 'Method "%s" not allowed.' % request.method}, status=405)
+
+    drf_request = Request(request, authenticators=[StatelessJSONWebTokenAuthentication()])
+    try:
+        drf_request.user
+    except AuthenticationFailed as exc:
+        return render({'detail': exc.detail}, status=401)
+
+    throttle = ReadWriteThrottle()
+    if not throttle.allow_request(drf_request, None):
+        response = render({'detail': 'Request was throttled.'}, status=429)
+        response['Retry-After'] = str(math.ceil(throttle.wait()))
+        return response
+
+    return None
+
+
+def async_list_view(queryset, serializer_class, filter_backends=()):
+    """
+    Async list view, paged on ``id``: ``?limit=`` (at most
+    ``MAX_PAGE_SIZE``) rows after ``?after=<id>``, with a ``next`` link to
+    the following page. Serializers only emit FK ids, which DRF reads from
+    the ``*_id`` attributes, so serialization never touches the database and
+    can run on the event loop.
+    """
+    async def view(request):
+        error = await sync_to_async(check_request)(request)
+        if error is not None:
+            return error
+
+        params = request.GET
+        try:
+            limit = _positive_int(params['limit'], strict=True, cutoff=MAX_PAGE_SIZE) if 'limit' in params else PAGE_SIZE
+            after = int(params.get('after', 0))
+        except ValueError:
+            return render({'detail': 'limit and after must be positive integers.'}, status=400)
+
+        page = queryset.all()
+        try:
+            for backend in filter_backends:
+                page = backend().filter_queryset(SimpleNamespace(query_params=params), page, None)
+        except ValidationError as exc:
+            return render(exc.detail, status=400)
+
+        objs = await alist(page.filter(pk__gt=after).order_by('pk')[:limit + 1])
+        next_link = None
+        if len(objs) > limit:
+            objs = objs[:limit]
+            next_link = replace_query_param(request.build_absolute_uri(), 'after', objs[-1].pk)
+
+        return render({'next': next_link, 'results': serializer_class(objs, many=True).data})
+
+    return view
+
+
+def async_detail_view(queryset, serializer_class):
+    async def view(request, pk):
+        error = await sync_to_async(check_request)(request)
+        if error is not None:
+            return error
+
+        try:
+            obj = await aget(queryset.all(), pk=pk)
+        except queryset.model.DoesNotExist:
+            return render({'detail': NotFound.default_detail}, status=404)
+
+        return render(serializer_class(obj).data)
+
+    return view
+
+
+book_list = async_list_view(Book.objects.all(), BookSerializer, [BookFilterBackend])
+book_detail = async_detail_view(Book.objects.all(), BookSerializer)
+category_list = async_list_view(Category.objects.all(), CategorySerializer)
+category_detail = async_detail_view(Category.objects.all(), CategorySerializer)
+company_list = async_list_view(Company.objects.all(), CompanySerializer)
+company_detail = async_detail_view(Company.objects.all(), CompanySerializer)
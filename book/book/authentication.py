@@ -0,0 +1,137 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.apps import apps
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.blacklist.exceptions import MissingToken
+from rest_framework_jwt.compat import ExpiredSignature
+from rest_framework_jwt.utils import jwt_create_payload as default_jwt_create_payload
+
+
+def jwt_create_payload(user):
+    """
+    Default drf-jwt payload plus ``user_id`` and ``is_staff``, which
+    ``StatelessJSONWebTokenAuthentication`` trusts on read-only requests.
+    """
+    payload = default_jwt_create_payload(user)
+    payload['user_id'] = user.pk
+    payload['is_staff'] = user.is_staff
+
+    return payload
+
+
+class TokenUser:
+    """
+    Stand-in for ``User`` built from verified token claims, carrying just
+    enough for permission checks on read-only requests.
+    """
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+    is_superuser = False
+
+    def __init__(self, payload):
+        self.pk = self.id = payload['user_id']
+        self.username = payload['username']
+        self.is_staff = bool(payload.get('is_staff', False))
+
+    def __str__(self):
+        return self.username
+
+    def get_username(self):
+        return self.username
+
+
+class TokenCache:
+    """
+    Thread-safe LRU of decoded token payloads keyed by the token's SHA-256,
+    bounded to ``maxsize`` entries. Entries are dropped once the token's
+    ``exp`` has passed.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def key(self, token):
+        if isinstance(token, str):
+            token = token.encode()
+
+        return hashlib.sha256(token).hexdigest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            payload = self.entries.get(key)
+            if payload is None:
+                return None
+            if payload.get('exp') is not None and payload['exp'] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+
+            return payload
+
+    def set(self, token, payload):
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(getattr(settings, 'BOOK_JWT_CACHE_SIZE', 1024))
+
+
+class StatelessJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JWT authentication that skips the user query on safe methods.
+
+    For GET/HEAD/OPTIONS the signed ``user_id``, ``username`` and
+    ``is_staff`` claims are trusted as-is and the decoded payload is cached
+    until the token expires. Writes, tokens without those claims, and
+    deployments using the drf-jwt blacklist go through the regular
+    database-backed authentication.
+    """
+    required_claims = ('user_id', 'username')
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS or apps.is_installed('rest_framework_jwt.blacklist'):
+            return super().authenticate(request)
+
+        try:
+            token = self.get_token_from_request(request)
+        except MissingToken:
+            return None
+        if token is None:
+            return None
+
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = self.decode(token)
+            if not all(payload.get(claim) for claim in self.required_claims):
+                return super().authenticate(request)
+            token_cache.set(token, payload)
+
+        return TokenUser(payload), token
+
+    def decode(self, token):
+        try:
+            return self.jwt_decode_token(token)
+        except ExpiredSignature:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except jwt.DecodeError:
+            raise exceptions.AuthenticationFailed('Error decoding token.')
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
@@ -0,0 +1,370 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from book.events import Event, EventStreamApp, broker
+from book.models import Book, Category, Company
+from book.urls import router
+
+
+# Routes that only answer authenticated users; the benchmark client is anonymous.
+PRIVATE_BASENAMES = ('job',)
+PRIVATE_ROUTES = ('book-mine',)
+
+
+def seed(categories=10, companies=10, books=1000, users=10, batch_size=1000):
+    """
+    Insert benchmark rows with ``bulk_create``. Existing rows are left alone;
+    new books are spread over the last three years.
+    """
+    suffix = int(time.time())
+    User.objects.bulk_create(
+        [User(username='bench-%d-%d' % (suffix, i)) for i in range(users)],
+        batch_size=batch_size
+    )
+    Category.objects.bulk_create(
+        [Category(category='bench-%d' % i) for i in range(categories)],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+    Company.objects.bulk_create(
+        [Company(company='bench-%d' % i, address='address-%d' % i, phone='%010d' % i) for i in range(companies)],
+        batch_size=batch_size, ignore_conflicts=True
+    )
+
+    user_ids = list(User.objects.values_list('id', flat=True))
+    category_ids = list(Category.objects.values_list('id', flat=True))
+    company_ids = list(Company.objects.values_list('id', flat=True))
+    now = timezone.now()
+    for start in range(0, books, batch_size):
+        Book.objects.bulk_create([
+            Book(
+                title='bench-%d' % i,
+                category_id=random.choice(category_ids),
+                company_id=random.choice(company_ids),
+                publish_date=now - timedelta(minutes=random.randint(0, 3 * 365 * 24 * 60)),
+                user_id=random.choice(user_ids),
+            )
+            for i in range(start, min(start + batch_size, books))
+        ])
+
+
+def get_endpoints():
+    """
+    Every GET route registered on the book router: list, detail (against the
+    first row) and the list-level extra actions, with name lookups querying
+    the first row's name.
+    """
+    endpoints = []
+    for prefix, viewset, basename in router.registry:
+        if basename in PRIVATE_BASENAMES:
+            continue
+        endpoints.append(('%s-list' % basename, reverse('%s-list' % basename)))
+
+        pk = viewset.queryset.order_by('pk').values_list('pk', flat=True).first()
+        if pk is not None and hasattr(viewset, 'retrieve'):
+            endpoints.append(('%s-detail' % basename, reverse('%s-detail' % basename, kwargs={'pk': pk})))
+
+        for extra_action in viewset.get_extra_actions():
+            if not extra_action.detail and 'get' in extra_action.mapping:
+                name = '%s-%s' % (basename, extra_action.url_name)
+                if name in PRIVATE_ROUTES:
+                    continue
+                url = reverse(name)
+                if extra_action.url_name == 'lookup':
+                    value = viewset.queryset.order_by('pk').values_list(viewset.name_field, flat=True).first()
+                    if value is None:
+                        continue
+                    url = '%s?%s' % (url, urlencode({'name': value}))
+                endpoints.append((name, url))
+
+    return endpoints
+
+
+# Benchmarks drive far more requests from one client than any budget allows;
+# they measure the endpoints, not the throttle.
+unthrottled = override_settings(BOOK_THROTTLE_RATES={})
+
+
+def percentile(timings, fraction):
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+@unthrottled
+def run_endpoint(url, requests, concurrency):
+    timings = []
+    query_counts = []
+    errors = []
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+
+    def worker():
+        client = Client()
+        local_timings, local_queries = [], []
+        try:
+            for _ in range(per_worker):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    if hasattr(response, 'streaming_content'):
+                        b''.join(response.streaming_content)
+                    local_timings.append(time.perf_counter() - start)
+                local_queries.append(len(queries))
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+        finally:
+            with lock:
+                timings.extend(local_timings)
+                query_counts.extend(local_queries)
+            if concurrency > 1:
+                connection.close()
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1),
+        'queries_per_request': round(sum(query_counts) / len(query_counts), 2),
+    }
+
+
+@unthrottled
+def run_async_endpoint(url, requests, concurrency):
+    """
+    Drive ``url`` through the ASGI handler with ``concurrency`` coroutines
+    sharing one event loop, the way concurrent connections reach a single
+    ASGI worker.
+    """
+    timings = []
+    per_worker = max(1, requests // concurrency)
+
+    async def worker(client):
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            await client.get(url)
+            timings.append(time.perf_counter() - start)
+
+    async def main():
+        client = AsyncClient()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+
+    return {
+        'requests': len(timings),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1),
+    }
+
+
+@unthrottled
+def run_wsgi(path, requests, concurrency):
+    """
+    Drive ``path`` through Django's real ``WSGIHandler``. Unlike the test
+    client it fires ``request_started``/``request_finished``, so connections
+    are opened and closed as ``CONN_MAX_AGE`` dictates. Also counts the
+    database connections opened along the way.
+    """
+    handler = WSGIHandler()
+    environ = RequestFactory()._base_environ(PATH_INFO=path, REQUEST_METHOD='GET')
+    timings = []
+    opened = []
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+
+    def count_connection(sender, connection, **kwargs):
+        with lock:
+            opened.append(connection.alias)
+
+    def start_response(status, headers, exc_info=None):
+        return None
+
+    def worker():
+        local_timings = []
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            response = handler(dict(environ), start_response)
+            b''.join(response)
+            response.close()
+            local_timings.append(time.perf_counter() - start)
+        with lock:
+            timings.extend(local_timings)
+        connection.close()
+
+    connection_created.connect(count_connection)
+    started = time.perf_counter()
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        connection_created.disconnect(count_connection)
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+
+    return {
+        'requests': len(timings),
+        'connections': len(opened),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1),
+    }
+
+
+class IdleConnection:
+    """
+    In-process ASGI client holding an event stream open until ``close()``.
+    Counts the events it is sent and keeps the body when ``record`` is set.
+    """
+    def __init__(self, app, query_string='', record=False, on_event=None):
+        self.record = record
+        self.on_event = on_event
+        self.status = None
+        self.body = b''
+        self.events = 0
+        self.gone = asyncio.Event()
+        scope = {'type': 'http', 'method': 'GET', 'path': app.path, 'query_string': query_string.encode(), 'headers': []}
+        self.task = asyncio.ensure_future(app(scope, self.receive, self.send))
+
+    async def receive(self):
+        await self.gone.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        body = message.get('body', b'')
+        if self.record:
+            self.body += body
+        if b'event: ' in body:
+            self.events += 1
+            if self.on_event:
+                self.on_event()
+
+    async def close(self):
+        self.gone.set()
+        await self.task
+
+
+@override_settings(BOOK_EVENTS_BACKEND='book.events.LocalBackend', BOOK_EVENTS_KEEPALIVE_SECONDS=3600)
+def run_idle_streams(connections=1000, events=10):
+    """
+    Hold ``connections`` idle event streams on one event loop, as they would
+    sit on a single ASGI worker, then publish ``events`` book changes. Reports
+    the memory each stream holds and how long each fan-out takes to reach
+    every stream.
+    """
+    timings = []
+
+    async def main():
+        app = EventStreamApp(None)
+        delivered = [0, asyncio.Event()]
+
+        def on_event():
+            delivered[0] += 1
+            if delivered[0] % connections == 0:
+                delivered[1].set()
+
+        subscribed = len(broker.subscriptions)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clients = [IdleConnection(app, on_event=on_event) for _ in range(connections)]
+        while len(broker.subscriptions) < subscribed + connections:
+            await asyncio.sleep(0.01)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        for i in range(events):
+            change = {'seq': i + 1, 'model': 'book', 'id': i + 1, 'action': 'created', 'data': {'id': i + 1, 'title': 'bench-%d' % i}}
+            delivered[1].clear()
+            start = time.perf_counter()
+            broker.publish([Event(change)])
+            await delivered[1].wait()
+            timings.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(client.close() for client in clients))
+
+        return memory
+
+    memory = asyncio.run(main())
+    timings.sort()
+
+    return {
+        'connections': connections,
+        'kb_per_connection': round(memory / connections / 1024, 2),
+        'fanout_p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'fanout_p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+    }
+
+
+def run(requests=100, concurrency=4, endpoints=None):
+    return {
+        name: run_endpoint(url, requests, concurrency)
+        for name, url in (endpoints or get_endpoints())
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Return a list of regressions against ``baseline``: any endpoint whose
+    p99 latency grew by more than ``tolerance`` or which now issues more SQL
+    queries per request.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append('%s: p99 %.3fms > baseline %.3fms' % (name, result['p99_ms'], previous['p99_ms']))
+        if result['queries_per_request'] > previous['queries_per_request']:
+            regressions.append('%s: %.2f queries/request > baseline %.2f' % (
+                name, result['queries_per_request'], previous['queries_per_request']
+            ))
+
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,126 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from book.routers import primary_reads
+
+
+KEY_PREFIX = 'book'
+
+
+def get_cache():
+    return caches[getattr(settings, 'BOOK_CACHE_ALIAS', 'default')]
+
+
+def version_key(model):
+    return '%s:version:%s' % (KEY_PREFIX, model._meta.label_lower)
+
+
+def new_version():
+    return time.time_ns()
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+
+    return [versions[key] for key in keys]
+
+
+def invalidate(model):
+    """
+    Bump the version of ``model`` so every cached response that depends on
+    it gets a new key. Old entries are never read again and age out.
+
+    The bump waits for the surrounding transaction to commit; bumping
+    earlier would let a concurrent reader cache pre-commit rows under the
+    new version.
+    """
+    transaction.on_commit(lambda: bump_version(model))
+
+
+def bump_version(model):
+    cache = get_cache()
+    key = version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def count(name):
+    cache = get_cache()
+    key = '%s:stats:%s' % (KEY_PREFIX, name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def cache_stats():
+    cache = get_cache()
+    stats = cache.get_many(['%s:stats:hits' % KEY_PREFIX, '%s:stats:misses' % KEY_PREFIX])
+
+    return {
+        'hits': stats.get('%s:stats:hits' % KEY_PREFIX, 0),
+        'misses': stats.get('%s:stats:misses' % KEY_PREFIX, 0),
+    }
+
+
+class CachedResponseMixin:
+    """
+    Caches ``list`` and ``retrieve`` responses keyed on path, query string,
+    auth scope and the current version of every model in
+    ``cache_dependencies``. Model signals bump those versions, so a write to
+    any dependency makes the next read miss.
+
+    Misses are read from the primary: a lagging replica would otherwise
+    store pre-write rows under the post-write versions until the next write.
+    """
+    cache_dependencies = ()
+
+    def get_cache_timeout(self):
+        return getattr(settings, 'BOOK_CACHE_TIMEOUT', 300)
+
+    def get_cache_key(self, request):
+        user = request.user
+        scope = 'user:%s' % user.pk if user and user.is_authenticated else 'anon'
+        versions = get_versions(self.cache_dependencies or [self.get_queryset().model])
+        raw = '|'.join([request.path, request.META.get('QUERY_STRING', ''), scope] + [str(v) for v in versions])
+
+        return '%s:response:%s' % (KEY_PREFIX, hashlib.md5(raw.encode()).hexdigest())
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            count('hits')
+            response = Response(cached)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        count('misses')
+        with primary_reads():
+            response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.get_cache_timeout())
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
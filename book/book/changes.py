@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from book.models import Change
+from book.serializers import BookSerializer, CategorySerializer, CompanySerializer
+
+
+SERIALIZERS = {
+    'book': BookSerializer,
+    'category': CategorySerializer,
+    'company': CompanySerializer,
+}
+
+
+def change_log_enabled():
+    return getattr(settings, 'BOOK_CHANGE_LOG', True)
+
+
+def record(model, instances, action):
+    """
+    Append a ``Change`` per instance once the surrounding transaction
+    commits. Recording after commit in one short INSERT keeps sequence order
+    close to commit order; ``visible_changes`` covers the rest. Instances
+    without a primary key (e.g. books written with COPY) can't be recorded.
+    """
+    changes = [
+        Change(model=model._meta.model_name, object_id=instance.pk, action=action)
+        for instance in instances if instance.pk is not None
+    ]
+    if changes:
+        transaction.on_commit(lambda: Change.objects.bulk_create(changes, batch_size=1000))
+
+
+def visible_changes():
+    """
+    Changes old enough to be safe to hand out. Two concurrent inserts can
+    commit out of sequence order, so a client that already read past a
+    sequence number would never see the one committed late; holding back
+    the last ``BOOK_CHANGES_LAG_SECONDS`` gives in-flight inserts time to
+    land first.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'BOOK_CHANGES_LAG_SECONDS', 1))
+
+    return Change.objects.filter(created_at__lte=cutoff)
+
+
+def serialize_changes(changes):
+    """
+    Render ``changes`` with the current state of each object, loaded with
+    one query per model. Deleted objects, and objects deleted since the
+    change was recorded, come out as tombstones with ``data`` set to None.
+    """
+    ids = {}
+    for change in changes:
+        ids.setdefault(change.model, set()).add(change.object_id)
+
+    current = {}
+    for name, object_ids in ids.items():
+        serializer_class = SERIALIZERS[name]
+        objs = serializer_class.Meta.model.objects.filter(pk__in=object_ids)
+        for data in serializer_class(objs, many=True).data:
+            current[name, data['id']] = data
+
+    return [
+        {
+            'seq': change.id,
+            'model': change.model,
+            'id': change.object_id,
+            'action': change.action,
+            'data': None if change.action == Change.Action.DELETED else current.get((change.model, change.object_id)),
+        }
+        for change in changes
+    ]
+
@@ -0,0 +1,128 @@
+import hashlib
+
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from book.cache import get_versions
+from book.routers import primary_reads
+
+
+def strip_weak(etag):
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+class ConditionalRequestMixin:
+    """
+    Conditional request handling for model viewsets.
+
+    List ETags are derived from the per-model version counters kept in the
+    cache, so a matching ``If-None-Match`` is answered with 304 without
+    touching the database. Detail ETags and ``Last-Modified`` come from the
+    row's ``updated_at``, which costs a single-column lookup and lets
+    PUT/PATCH honour ``If-Match`` for optimistic concurrency.
+
+    Actions in ``user_scoped_actions`` list only the caller's rows, so their
+    ETags also cover the caller and their responses vary on
+    ``Authorization``.
+    """
+    user_scoped_actions = ()
+
+    def is_user_scoped(self):
+        return getattr(self, 'action', None) in self.user_scoped_actions
+
+    def get_list_etag(self, request):
+        dependencies = getattr(self, 'cache_dependencies', ()) or [self.get_queryset().model]
+        parts = [request.path, request.META.get('QUERY_STRING', '')]
+        if self.is_user_scoped():
+            user = request.user
+            parts.append('user:%s' % user.pk if user and user.is_authenticated else 'anon')
+        parts += [str(version) for version in get_versions(dependencies)]
+
+        return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+    def get_updated_at(self, for_update=False):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        if for_update:
+            queryset = queryset.select_for_update()
+
+        return queryset.values_list('updated_at', flat=True).first()
+
+    def get_detail_etag(self, request, updated_at, with_query=True):
+        parts = [request.path, updated_at.isoformat()]
+        query_string = request.META.get('QUERY_STRING', '')
+        if with_query and query_string:
+            dependencies = getattr(self, 'cache_dependencies', ())
+            parts += [query_string] + [str(version) for version in get_versions(dependencies)]
+
+        return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+    def not_modified(self, request, etag, updated_at=None):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [strip_weak(tag) for tag in parse_etags(if_none_match)]
+            return '*' in etags or etag in etags
+
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if updated_at is not None and if_modified_since is not None:
+            return int(updated_at.timestamp()) <= if_modified_since
+
+        return False
+
+    def conditional_response(self, response, etag, updated_at=None):
+        if response.status_code == status.HTTP_304_NOT_MODIFIED or status.is_success(response.status_code):
+            response['ETag'] = etag
+            if updated_at is not None:
+                response['Last-Modified'] = http_date(updated_at.timestamp())
+        if self.is_user_scoped():
+            patch_vary_headers(response, ['Authorization'])
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        if self.not_modified(request, etag):
+            return self.conditional_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        return self.conditional_response(super().list(request, *args, **kwargs), etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Like the cached body, the ETag must not come from a lagging replica.
+        with primary_reads():
+            updated_at = self.get_updated_at()
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = self.get_detail_etag(request, updated_at)
+        if self.not_modified(request, etag, updated_at):
+            return self.conditional_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag, updated_at)
+
+        return self.conditional_response(super().retrieve(request, *args, **kwargs), etag, updated_at)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            if_match = request.META.get('HTTP_IF_MATCH')
+            if if_match:
+                updated_at = self.get_updated_at(for_update=True)
+                if updated_at is None:
+                    # Raises the same 404 as an update without If-Match, also for rows get_queryset hides.
+                    self.get_object()
+                etags = parse_etags(if_match)
+                current = self.get_detail_etag(request, updated_at, with_query=False)
+                if '*' not in etags and current not in etags:
+                    return Response(
+                        {'detail': 'The resource has been modified.'},
+                        status=status.HTTP_412_PRECONDITION_FAILED
+                    )
+
+            response = super().update(request, *args, **kwargs)
+
+        updated_at = self.get_updated_at()
+        if updated_at is not None:
+            etag = self.get_detail_etag(request, updated_at, with_query=False)
+            response = self.conditional_response(response, etag, updated_at)
+
+        return response
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import Case, Count, DateField, Min, Value, When
+from django.db.models.functions import Lower, TruncMonth
+from django.utils import timezone
+
+
+def merge_duplicates(model, field, book_model, stat_model, batch_size=500, on_repoint=None):
+    """
+    Merge rows of ``model`` whose ``field`` only differs by case into the
+    row with the lowest id, repointing ``book_model`` foreign keys with one
+    ``UPDATE`` per batch of duplicate groups. Affected ``stat_model``
+    summary rows are recomputed from the merged books.
+
+    Takes the models as arguments so data migrations can pass historical
+    ones. Only ``batch_size`` groups are held in memory at a time; merged
+    groups drop out of the duplicate query, so it is simply re-run until
+    it comes back empty. Returns the number of rows removed.
+
+    The ``UPDATE`` sends no signals, so callers keeping other tables in step
+    pass ``on_repoint``, called with the ids of each batch's repointed books
+    inside that batch's transaction.
+    """
+    fk = '%s_id' % model._meta.model_name
+    groups = (
+        model.objects
+        .annotate(name_key=Lower(field))
+        .values('name_key')
+        .annotate(keep=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+        .values_list('name_key', 'keep')
+    )
+    merged = 0
+
+    while True:
+        keep_by_name = dict(groups[:batch_size])
+        if not keep_by_name:
+            return merged
+
+        duplicates = (
+            model.objects
+            .annotate(name_key=Lower(field))
+            .filter(name_key__in=keep_by_name)
+            .exclude(id__in=keep_by_name.values())
+            .values_list('id', 'name_key')
+        )
+        targets = {pk: keep_by_name[name] for pk, name in duplicates}
+
+        with transaction.atomic():
+            books = book_model.objects.filter(**{'%s__in' % fk: targets})
+            book_ids = list(books.values_list('id', flat=True)) if on_repoint else None
+            # update() skips auto_now, and detail ETags are built from updated_at.
+            books.update(updated_at=timezone.now(), **{
+                fk: Case(*(When(**{fk: pk}, then=Value(keep)) for pk, keep in targets.items()))
+            })
+            if on_repoint and book_ids:
+                on_repoint(book_ids)
+
+            stats = stat_model.objects.filter(**{'%s__in' % fk: list(targets) + list(keep_by_name.values())})
+            if stats.exists():
+                stats.delete()
+                rows = (
+                    book_model.objects
+                    .filter(**{'%s__in' % fk: keep_by_name.values()})
+                    .annotate(month=TruncMonth('publish_date', output_field=DateField()))
+                    .values('category_id', 'company_id', 'month')
+                    .annotate(books=Count('id'))
+                    .order_by()
+                )
+                stat_model.objects.bulk_create((stat_model(**row) for row in rows.iterator()), batch_size=1000)
+
+            model.objects.filter(id__in=targets).delete()
+
+        merged += len(targets)
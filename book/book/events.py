@@ -0,0 +1,294 @@
+import asyncio
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+
+from book.changes import SERIALIZERS, serialize_changes, visible_changes
+from book.models import Change
+
+
+class Event:
+    """
+    A change pushed to subscribers, encoded once as a server-sent event
+    however many subscribers receive it. ``category``/``company`` route it
+    to filtered subscribers; None matches every filter.
+    """
+    __slots__ = ('category', 'company', 'message')
+
+    def __init__(self, change, category=None, company=None):
+        self.category = category
+        self.company = company
+        message = b''
+        if change.get('seq') is not None:
+            message += b'id: %d\n' % change['seq']
+        self.message = message + b'event: %s\ndata: %s\n\n' % (change['model'].encode(), JSONRenderer().render(change))
+
+    def matches(self, categories, companies):
+        return (
+            (not categories or self.category is None or self.category in categories) and
+            (not companies or self.company is None or self.company in companies)
+        )
+
+
+def event_for(change):
+    """Build the event for a ``serialize_changes`` entry."""
+    if change['model'] == 'category':
+        return Event(change, category=change['id'])
+    if change['model'] == 'company':
+        return Event(change, company=change['id'])
+    data = change['data'] or {}
+
+    return Event(change, category=data.get('category'), company=data.get('company'))
+
+
+class Subscription:
+    def __init__(self, categories, companies, maxsize):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.categories = categories
+        self.companies = companies
+        self.closed = False
+        self.disconnected = False
+
+    def put(self, message):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind reconnects and catches up from /api/changes/.
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+def deliver(deliveries):
+    for subscription, messages in deliveries:
+        for message in messages:
+            subscription.put(message)
+
+
+class Broker:
+    """
+    In-process fan-out. ``publish`` may be called from any thread; matching
+    messages are handed to each event loop in one batch rather than one
+    callback per subscriber.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+
+    def subscribe(self, categories=frozenset(), companies=frozenset(), maxsize=100):
+        subscription = Subscription(categories, companies, maxsize)
+        with self.lock:
+            self.subscriptions.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def ping(self, loop, message):
+        """Send ``message`` to every subscription on ``loop``, from that loop."""
+        with self.lock:
+            subscriptions = [subscription for subscription in self.subscriptions if subscription.loop is loop]
+        for subscription in subscriptions:
+            subscription.put(message)
+
+        return len(subscriptions)
+
+    def publish(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+
+        by_loop = {}
+        for subscription in subscriptions:
+            messages = [event.message for event in events if event.matches(subscription.categories, subscription.companies)]
+            if messages:
+                by_loop.setdefault(subscription.loop, []).append((subscription, messages))
+        for loop, deliveries in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, deliveries)
+            except RuntimeError:
+                # The loop has shut down; its subscriptions are going away with it.
+                pass
+
+
+broker = Broker()
+
+
+class LocalBackend:
+    """
+    Publishes committed writes straight to this process's subscribers.
+    Enough when one process serves both writes and streams; otherwise use
+    ``ChangeLogBackend``.
+    """
+    def notify(self, model, instances, action):
+        if not broker.subscriptions:
+            return
+
+        name = model._meta.model_name
+        events = []
+        for instance in instances:
+            if instance.pk is None:
+                continue
+            data = None if action == Change.Action.DELETED else SERIALIZERS[name](instance).data
+            change = {'seq': None, 'model': name, 'id': instance.pk, 'action': action, 'data': data}
+            if name == 'book':
+                events.append(Event(change, category=instance.category_id, company=instance.company_id))
+            else:
+                events.append(event_for(change))
+        if events:
+            transaction.on_commit(lambda: broker.publish(events))
+
+    async def start(self):
+        pass
+
+
+class ChangeLogBackend:
+    """
+    Every streaming process tails the change log every
+    ``BOOK_EVENTS_POLL_SECONDS`` and publishes what it finds, so writes made
+    by any process reach every subscriber. Needs ``BOOK_CHANGE_LOG``.
+    """
+    batch_size = 1000
+
+    def __init__(self):
+        self.task = None
+        self.last_seq = None
+
+    def notify(self, model, instances, action):
+        pass
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.task = loop.create_task(self.poll())
+
+    def fetch(self):
+        if self.last_seq is None:
+            self.last_seq = visible_changes().order_by('-pk').values_list('pk', flat=True).first() or 0
+            return []
+
+        changes = list(visible_changes().filter(pk__gt=self.last_seq).order_by('pk')[:self.batch_size])
+        if not changes:
+            return []
+        self.last_seq = changes[-1].pk
+        if not broker.subscriptions:
+            return []
+
+        return [event_for(change) for change in serialize_changes(changes)]
+
+    async def poll(self):
+        while True:
+            events = await sync_to_async(self.fetch)()
+            if events:
+                broker.publish(events)
+            else:
+                await asyncio.sleep(getattr(settings, 'BOOK_EVENTS_POLL_SECONDS', 1))
+
+
+_backends = {}
+
+
+def get_backend():
+    path = getattr(settings, 'BOOK_EVENTS_BACKEND', 'book.events.LocalBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+
+    return _backends[path]
+
+
+def notify(model, instances, action):
+    get_backend().notify(model, instances, action)
+
+
+def parse_ids(values):
+    return frozenset(int(value) for raw in values or () for value in raw.split(',') if value)
+
+
+class EventStreamApp:
+    """
+    ASGI application serving ``GET <path>`` as a server-sent events stream
+    of book, category and company changes, and passing every other request
+    on to ``application``. ``?category=1,2`` and ``?company=3`` narrow the
+    book events sent. Idle streams cost a queue and two waiting coroutines;
+    one task per event loop sends them all a comment every
+    ``BOOK_EVENTS_KEEPALIVE_SECONDS`` so proxies keep them open.
+    """
+    keepalive_message = b': keepalive\n\n'
+
+    def __init__(self, application, path='/api/events/'):
+        self.application = application
+        self.path = path
+        self.keepalive_task = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != self.path:
+            return await self.application(scope, receive, send)
+
+        if scope['method'] != 'GET':
+            return await self.respond(send, 405, b'{"detail":"Method \\"%s\\" not allowed."}' % scope['method'].encode())
+        params = parse_qs(scope['query_string'].decode('latin-1'))
+        try:
+            categories, companies = parse_ids(params.get('category')), parse_ids(params.get('company'))
+        except ValueError:
+            return await self.respond(send, 400, b'{"detail":"category and company must be comma separated ids."}')
+
+        await get_backend().start()
+        self.start_keepalive()
+        subscription = broker.subscribe(categories, companies, getattr(settings, 'BOOK_EVENTS_QUEUE_SIZE', 100))
+        watcher = asyncio.ensure_future(self.wait_for_disconnect(receive, subscription))
+        try:
+            await self.stream(send, subscription)
+        finally:
+            watcher.cancel()
+            broker.unsubscribe(subscription)
+
+    async def respond(self, send, status, body):
+        await send({'type': 'http.response.start', 'status': status, 'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def start_keepalive(self):
+        loop = asyncio.get_running_loop()
+        if self.keepalive_task is None or self.keepalive_task.done() or self.keepalive_task.get_loop() is not loop:
+            self.keepalive_task = loop.create_task(self.send_keepalives(loop))
+
+    async def send_keepalives(self, loop):
+        while True:
+            await asyncio.sleep(getattr(settings, 'BOOK_EVENTS_KEEPALIVE_SECONDS', 15))
+            if not broker.ping(loop, self.keepalive_message):
+                return
+
+    async def wait_for_disconnect(self, receive, subscription):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.disconnected = True
+        subscription.close()
+
+    async def stream(self, send, subscription):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            message = await subscription.queue.get()
+            if message is None:
+                break
+            await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+        if not subscription.disconnected:
+            await send({'type': 'http.response.body', 'body': b''})
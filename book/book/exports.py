@@ -0,0 +1,36 @@
+import json
+from itertools import islice
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iter_serialized(queryset, serializer_class, chunk_size, context=None):
+    """
+    Yield one serialized dict per row, reading ``queryset`` through a
+    server-side cursor and serializing ``chunk_size`` rows at a time so only
+    a single chunk is ever held in memory.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from serializer_class(chunk, many=True, context=context or {}).data
+
+
+def dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def ndjson_stream(items):
+    for item in items:
+        yield dumps(item) + '\n'
+
+
+def json_array_stream(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + dumps(item)
+        separator = ','
+    yield ']'
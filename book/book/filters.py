@@ -0,0 +1,88 @@
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connection
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+SEARCH_CONFIG = 'simple'
+
+
+def title_search_vector():
+    return SearchVector('title', config=SEARCH_CONFIG)
+
+
+def parse_moment(value):
+    # Well-formed but impossible values such as 2020-13-45 raise ValueError.
+    try:
+        moment = parse_datetime(value)
+        date = parse_date(value) if moment is None else None
+    except ValueError:
+        return None
+    if moment is None:
+        if date is None:
+            return None
+        moment = timezone.datetime.combine(date, timezone.datetime.min.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    return moment
+
+
+class BookFilterBackend(BaseFilterBackend):
+    """
+    Filters books by ``category``, ``company``, ``user``,
+    ``published_after``, ``published_before`` and ``search``.
+
+    Every filter lines up with an index on ``book_book``: the FK filters with
+    the ``(category_id, publish_date)``/``(company_id, publish_date)``/
+    ``(user_id, publish_date)`` composites, the date range with ``(publish_date, id)``, and ``search``
+    with the GIN index on the title's ``tsvector`` on PostgreSQL. Other
+    backends fall back to ``icontains`` for search.
+    """
+    fk_params = ('category', 'company', 'user')
+    date_params = {
+        'published_after': 'publish_date__gte',
+        'published_before': 'publish_date__lt',
+    }
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        filters = {}
+        errors = {}
+
+        for name in self.fk_params:
+            if name in params:
+                try:
+                    filters['%s_id' % name] = int(params[name])
+                except ValueError:
+                    errors[name] = 'A valid integer is required.'
+
+        for name, lookup in self.date_params.items():
+            if name in params:
+                moment = parse_moment(params[name])
+                if moment is None:
+                    errors[name] = 'A valid date or datetime is required.'
+                else:
+                    filters[lookup] = moment
+
+        if errors:
+            raise ValidationError(errors)
+
+        queryset = queryset.filter(**filters)
+
+        search = params.get(self.search_param, '').strip()
+        if search:
+            queryset = self.search(queryset, search)
+
+        return queryset
+
+    def search(self, queryset, terms):
+        if connection.vendor == 'postgresql':
+            return queryset.annotate(search=title_search_vector()).filter(
+                search=SearchQuery(terms, config=SEARCH_CONFIG)
+            )
+
+        return queryset.filter(title__icontains=terms)
@@ -0,0 +1,264 @@
+import csv
+import io
+import os
+from datetime import date, datetime
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from book.models import Book, Category, Company
+from book.signals import bulk_saved
+
+
+class RowError(Exception):
+    def __init__(self, line, message):
+        super().__init__('Line %d: %s' % (line, message))
+        self.line = line
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        yield from csv.DictReader(f)
+
+
+def read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RowError(0, 'openpyxl is required to import .xlsx files.')
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for row in rows:
+            if any(cell is not None for cell in row):
+                yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        return read_xlsx(path)
+
+    return read_csv(path)
+
+
+def parse_publish_date(value):
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime.combine(value, datetime.min.time())
+    else:
+        value = str(value or '').strip()
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                moment = day and datetime.combine(day, datetime.min.time())
+        except ValueError:
+            return None
+    if moment is None:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    return moment
+
+
+# Columns checked against the field they are written to, so an oversized
+# value fails its row instead of the whole chunk.
+LIMITED_COLUMNS = (
+    ('title', Book, 'title'),
+    ('category', Category, 'category'),
+    ('company', Company, 'company'),
+    ('address', Company, 'address'),
+    ('phone', Company, 'phone'),
+)
+
+
+class BookImporter:
+    """
+    Streams book rows into the database in chunks.
+
+    Rows need ``title``, ``category``, ``company``, ``publish_date`` and
+    ``user`` (username or id) columns; ``address`` and ``phone`` are used
+    when a company has to be created. Category and company names are
+    resolved case-insensitively through in-memory name to id maps loaded
+    once, missing ones
+    are created in bulk per chunk, and books are written with
+    ``bulk_create`` or, on PostgreSQL, ``COPY``. Each chunk commits on its
+    own and is recorded in ``checkpoint`` so an interrupted import can be
+    resumed.
+    """
+    def __init__(self, chunk_size=5000, use_copy=False, skip_errors=False, checkpoint=None):
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.skip_errors = skip_errors
+        self.checkpoint = checkpoint
+        self.errors = []
+        self.imported = 0
+
+        self.categories = {}
+        for pk, name in Category.objects.order_by('id').values_list('id', 'category').iterator():
+            self.categories.setdefault(name.lower(), pk)
+        self.companies = {}
+        for pk, name in Company.objects.order_by('id').values_list('id', 'company').iterator():
+            self.companies.setdefault(name.lower(), pk)
+        self.users = {}
+
+    def read_checkpoint(self):
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as f:
+            return int(f.read().strip() or 0)
+
+    def write_checkpoint(self, rows):
+        if self.checkpoint:
+            with open(self.checkpoint, 'w') as f:
+                f.write(str(rows))
+
+    def run(self, rows, resume=False, progress=None):
+        done = self.read_checkpoint() if resume else 0
+        rows = enumerate(rows, start=2)
+        for _ in islice(rows, done):
+            pass
+
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                self.import_chunk(chunk)
+            done += len(chunk)
+            self.write_checkpoint(done)
+            if progress:
+                progress(done, self.imported, len(self.errors))
+
+        return self.imported
+
+    def resolve_users(self, chunk):
+        names, ids = set(), set()
+        for _, row in chunk:
+            value = str(row.get('user') or '').strip()
+            if not value or value in self.users:
+                continue
+            (ids if value.isdigit() else names).add(value)
+        if ids:
+            for pk in User.objects.filter(pk__in=ids).values_list('id', flat=True):
+                self.users[str(pk)] = pk
+        if names:
+            for pk, username in User.objects.filter(username__in=names).values_list('id', 'username'):
+                self.users[username] = pk
+
+    def create_missing(self, model, field, names, mapping, defaults):
+        missing = {}
+        for name in names:
+            if name.lower() not in mapping:
+                missing.setdefault(name.lower(), name)
+        if not missing:
+            return
+        # A concurrent import may create the same names first; those rows are
+        # skipped rather than failing the chunk, so ids are read back by name.
+        model.objects.bulk_create(
+            [model(**{field: name}, **defaults.get(name, {})) for name in missing.values()],
+            ignore_conflicts=True
+        )
+        objs = list(model.objects.alias(name_key=Lower(field)).filter(name_key__in=missing))
+        for obj in objs:
+            mapping.setdefault(getattr(obj, field).lower(), obj.pk)
+        bulk_saved.send(sender=model, instances=objs, previous=None)
+
+    def import_chunk(self, chunk):
+        self.resolve_users(chunk)
+
+        valid = []
+        for line, row in chunk:
+            row = {key: (value.strip() if isinstance(value, str) else value) for key, value in row.items() if key}
+            try:
+                valid.append((line, row, self.validate(line, row)))
+            except RowError as error:
+                if not self.skip_errors:
+                    raise
+                self.errors.append(error)
+
+        company_defaults = {
+            row['company']: {'address': row.get('address') or '', 'phone': row.get('phone') or ''}
+            for _, row, _ in valid
+        }
+        self.create_missing(Category, 'category', {row['category'] for _, row, _ in valid}, self.categories, {})
+        self.create_missing(Company, 'company', set(company_defaults), self.companies, company_defaults)
+
+        books = [
+            Book(
+                title=row['title'],
+                category_id=self.categories[row['category'].lower()],
+                company_id=self.companies[row['company'].lower()],
+                publish_date=publish_date,
+                user_id=user_id,
+            )
+            for _, row, (publish_date, user_id) in valid
+        ]
+        if self.use_copy:
+            self.copy(books)
+        else:
+            Book.objects.bulk_create(books, batch_size=1000)
+        bulk_saved.send(sender=Book, instances=books, previous=None)
+        self.imported += len(books)
+
+    def validate(self, line, row):
+        for column in ('title', 'category', 'company', 'publish_date', 'user'):
+            if not row.get(column):
+                raise RowError(line, 'Missing "%s".' % column)
+        for column, model, field in LIMITED_COLUMNS:
+            if len(str(row.get(column) or '')) > model._meta.get_field(field).max_length:
+                raise RowError(line, '"%s" is too long.' % column)
+
+        publish_date = parse_publish_date(row['publish_date'])
+        if publish_date is None:
+            raise RowError(line, 'Invalid publish_date "%s".' % row['publish_date'])
+        user_id = self.users.get(str(row['user']))
+        if user_id is None:
+            raise RowError(line, 'Unknown user "%s".' % row['user'])
+
+        row['title'], row['category'], row['company'] = str(row['title']), str(row['category']), str(row['company'])
+
+        return publish_date, user_id
+
+    def copy(self, books):
+        """
+        COPY the books into a temporary table, then move them across with
+        one ``INSERT ... RETURNING`` so each book gets its id back for the
+        change log, listings and events.
+        """
+        now = timezone.now()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for position, book in enumerate(books):
+            writer.writerow([position, book.title, book.category_id, book.company_id, book.publish_date.isoformat(), book.user_id, now.isoformat()])
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(Book._meta.db_table)
+        columns = 'title, category_id, company_id, publish_date, user_id, updated_at'
+        sql = 'COPY book_import (position, %s) FROM STDIN WITH (FORMAT csv)' % columns
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE book_import AS SELECT 0 AS position, %s FROM %s WITH NO DATA' % (columns, table)
+            )
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):
+                raw.copy_expert(sql, buffer)
+            else:
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            cursor.execute(
+                'INSERT INTO %s (%s) SELECT %s FROM book_import ORDER BY position RETURNING id' % (table, columns, columns)
+            )
+            for book, (pk,) in zip(books, cursor.fetchall()):
+                book.pk, book.updated_at = pk, now
+            cursor.execute('DROP TABLE book_import')
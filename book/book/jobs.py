@@ -0,0 +1,118 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from book.models import Job
+
+
+class Task:
+    def __init__(self, func, name, staff_only, payload_serializer):
+        self.func = func
+        self.name = name
+        self.staff_only = staff_only
+        self.payload_serializer = payload_serializer
+
+
+registry = {}
+
+
+def task(name=None, staff_only=False, payload_serializer=serializers.Serializer):
+    """
+    Register ``func(job, **payload)`` as a background task. Its return
+    value is stored as the job's JSON result. Payloads submitted to
+    ``/api/jobs/`` are validated with ``payload_serializer`` and reduced to
+    its fields, so bad input is a 400 rather than a failed job.
+    """
+    def decorator(func):
+        registry[name or func.__name__] = Task(func, name or func.__name__, staff_only, payload_serializer)
+        return func
+
+    return decorator
+
+
+class DatabaseBackend:
+    """Leaves pending jobs in the table for ``manage.py run_book_worker``."""
+    def enqueue(self, job):
+        pass
+
+
+class ImmediateBackend:
+    """Runs jobs in-process as soon as they are committed. For development and tests."""
+    def enqueue(self, job):
+        run_job(job)
+
+
+def get_backend():
+    return import_string(getattr(settings, 'BOOK_TASK_BACKEND', 'book.jobs.DatabaseBackend'))()
+
+
+def enqueue(name, payload=None, user=None):
+    """
+    Record a pending job and hand it to the configured backend once the
+    current transaction commits, so workers never see uncommitted jobs.
+    """
+    if name not in registry:
+        raise KeyError('Unknown task "%s".' % name)
+
+    job = Job.objects.create(task=name, payload=payload or {}, user=user)
+    transaction.on_commit(lambda: get_backend().enqueue(job))
+
+    return job
+
+
+def claim(job):
+    """Mark ``job`` running unless another worker got there first."""
+    now = timezone.now()
+    claimed = (
+        Job.objects
+        .filter(pk=job.pk, status=job.status, started_at=job.started_at)
+        .update(status=Job.Status.RUNNING, started_at=now)
+    )
+    if claimed:
+        job.status, job.started_at = Job.Status.RUNNING, now
+
+    return bool(claimed)
+
+
+def claim_next():
+    """
+    Claim the oldest pending job, or a running one whose worker has held it
+    longer than ``BOOK_TASK_LEASE_SECONDS`` and so most likely died with it.
+    ``SKIP LOCKED`` keeps concurrent workers from queueing behind each
+    other's row locks on PostgreSQL; the conditional update in ``claim`` is
+    what guarantees a job is claimed once.
+    """
+    while True:
+        expired = timezone.now() - timedelta(seconds=getattr(settings, 'BOOK_TASK_LEASE_SECONDS', 3600))
+        with transaction.atomic():
+            job = (
+                Job.objects
+                .select_for_update(skip_locked=True)
+                .filter(Q(status=Job.Status.PENDING) | Q(status=Job.Status.RUNNING, started_at__lt=expired))
+                .order_by('id')
+                .first()
+            )
+            if job is None or claim(job):
+                return job
+
+
+def run_job(job):
+    if job.status == Job.Status.PENDING and not claim(job):
+        return job
+
+    try:
+        job.result = registry[job.task].func(job, **job.payload)
+        job.status = Job.Status.SUCCEEDED
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = Job.Status.FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'error', 'status', 'finished_at'])
+
+    return job
@@ -0,0 +1,73 @@
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from book.models import Book, BookListing, Category, Company
+
+
+COLUMNS = {
+    'id': 'id',
+    'title': 'title',
+    'publish_date': 'publish_date',
+    'category_id': 'category_id',
+    'category_name': 'category__category',
+    'company_id': 'company_id',
+    'company_name': 'company__company',
+    'company_address': 'company__address',
+    'company_phone': 'company__phone',
+    'user_id': 'user_id',
+    'username': 'user__username',
+}
+
+
+# Source fields copied into each listing, mapped to their listing column.
+LISTED_FIELDS = {
+    Category: {'category': 'category_name'},
+    Company: {'company': 'company_name', 'address': 'company_address', 'phone': 'company_phone'},
+    User: {'username': 'username'},
+}
+
+
+def listing_enabled():
+    return getattr(settings, 'BOOK_LISTING', False)
+
+
+def listings_for(books):
+    """Build ``BookListing`` rows for a ``Book`` queryset with one joined query."""
+    rows = books.values_list(*COLUMNS.values()).order_by()
+
+    return (BookListing(**dict(zip(COLUMNS, row))) for row in rows.iterator())
+
+
+def refresh(book_ids):
+    book_ids = [pk for pk in book_ids if pk is not None]
+    if not book_ids:
+        return
+    with transaction.atomic():
+        BookListing.objects.filter(id__in=book_ids).delete()
+        BookListing.objects.bulk_create(listings_for(Book.objects.filter(id__in=book_ids)), batch_size=1000)
+
+
+def remove(book_ids):
+    BookListing.objects.filter(id__in=book_ids).delete()
+
+
+def rename(model, instances):
+    """Copy changed names of ``Category``/``Company``/``User`` rows into their listings."""
+    for instance in instances:
+        BookListing.objects.filter(**{'%s_id' % model._meta.model_name: instance.pk}).update(**{
+            column: getattr(instance, field) for field, column in LISTED_FIELDS[model].items()
+        })
+
+
+def rebuild(batch_size=5000):
+    rows = listings_for(Book.objects.all())
+    with transaction.atomic():
+        BookListing.objects.all().delete()
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            BookListing.objects.bulk_create(chunk)
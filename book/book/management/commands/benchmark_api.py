@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from book import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Exercise every GET route of the book API with concurrent clients and '
+        'report latency, throughput and SQL queries per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--baseline', help='JSON file with previous results to compare against.')
+        parser.add_argument('--save-baseline', action='store_true', help='Write the results to --baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed p99 regression, as a fraction.')
+
+    def handle(self, *args, **options):
+        results = benchmark.run(requests=options['requests'], concurrency=options['concurrency'])
+
+        self.stdout.write('%-24s %8s %10s %10s %10s %8s' % ('endpoint', 'requests', 'p50 ms', 'p99 ms', 'req/s', 'queries'))
+        for name, result in results.items():
+            self.stdout.write('%-24s %8d %10.3f %10.3f %10.1f %8.2f' % (
+                name, result['requests'], result['p50_ms'], result['p99_ms'], result['rps'], result['queries_per_request']
+            ))
+
+        errors = {name: result['errors'] for name, result in results.items() if result['errors']}
+        if errors:
+            raise CommandError('Requests failed: %s' % errors)
+
+        baseline = options['baseline']
+        if not baseline:
+            return
+        if options['save_baseline']:
+            benchmark.save_baseline(baseline, results)
+            self.stdout.write(self.style.SUCCESS('Saved baseline to %s.' % baseline))
+            return
+        if not os.path.exists(baseline):
+            raise CommandError('Baseline %s does not exist; run with --save-baseline first.' % baseline)
+
+        regressions = benchmark.compare(results, benchmark.load_baseline(baseline), options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions against baseline:\n%s' % '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against %s.' % baseline))
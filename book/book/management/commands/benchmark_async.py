@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from book import async_views, benchmark
+from book.models import Book, Category, Company
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of the synchronous viewsets over WSGI and ASGI '
+        'with the async read views over ASGI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode.')
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        requests, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write('%-18s %-12s %10s %10s %10s' % ('endpoint', 'mode', 'p50 ms', 'p99 ms', 'req/s'))
+        for basename, model in (('book', Book), ('category', Category), ('company', Company)):
+            pk = model.objects.order_by('pk').values_list('pk', flat=True).first()
+            routes = [('list', {})] + ([('detail', {'pk': pk})] if pk is not None else [])
+            for route, kwargs in routes:
+                sync_url = reverse('%s-%s' % (basename, route), kwargs=kwargs)
+                async_url = reverse('async-%s-%s' % (basename, route), kwargs=kwargs)
+                if route == 'list':
+                    # The async lists are paged; compare pages of the same size.
+                    sync_url += '?page_size=%d' % async_views.PAGE_SIZE
+                    async_url += '?limit=%d' % async_views.PAGE_SIZE
+                results = [
+                    ('wsgi', benchmark.run_endpoint(sync_url, requests, concurrency)),
+                    ('asgi-sync', benchmark.run_async_endpoint(sync_url, requests, concurrency)),
+                    ('asgi-async', benchmark.run_async_endpoint(async_url, requests, concurrency)),
+                ]
+                for mode, result in results:
+                    self.stdout.write('%-18s %-12s %10.3f %10.3f %10.1f' % (
+                        '%s-%s' % (basename, route), mode, result['p50_ms'], result['p99_ms'], result['rps']
+                    ))
@@ -0,0 +1,47 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+
+from book.authentication import StatelessJSONWebTokenAuthentication, jwt_create_payload, token_cache
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request latency of the default and stateless JWT authentication.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark-auth', password='benchmark-auth')
+            token = JSONWebTokenAuthentication.jwt_encode_payload(jwt_create_payload(user))
+            factory = APIRequestFactory()
+            token_cache.clear()
+
+            for authentication_class in (JSONWebTokenAuthentication, StatelessJSONWebTokenAuthentication):
+                self.run(authentication_class(), factory, token, options['requests'])
+
+            transaction.set_rollback(True)
+
+    def run(self, authentication, factory, token, requests):
+        request = factory.get('/api/book/', HTTP_AUTHORIZATION='Bearer %s' % token)
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(requests):
+                start = time.perf_counter()
+                authentication.authenticate(Request(request))
+                timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        self.stdout.write('%s: p50 %.1fus, p99 %.1fus, %.2f queries/request' % (
+            type(authentication).__name__,
+            timings[len(timings) // 2] * 1e6,
+            timings[int(len(timings) * 0.99)] * 1e6,
+            len(queries) / requests,
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.urls import reverse
+
+from book import benchmark
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare latency of an endpoint with a new database connection per '
+        'request (CONN_MAX_AGE=0) against persistent connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=None,
+            help='Defaults to the first book\'s detail route, which always reads the database; '
+                 'list routes are mostly served from the response cache.'
+        )
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE for the persistent run.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path is None:
+            path = reverse('book-detail', kwargs={'pk': Book.objects.order_by('pk').values_list('pk', flat=True).first()})
+        original = {alias: connections.settings[alias]['CONN_MAX_AGE'] for alias in connections}
+
+        self.stdout.write('%-14s %12s %10s %10s %10s' % ('CONN_MAX_AGE', 'connections', 'p50 ms', 'p99 ms', 'req/s'))
+        try:
+            for max_age in (0, options['max_age']):
+                for alias in connections:
+                    connections.settings[alias]['CONN_MAX_AGE'] = max_age
+                connections.close_all()
+
+                result = benchmark.run_wsgi(path, options['requests'], options['concurrency'])
+                self.stdout.write('%-14s %12d %10.3f %10.3f %10.1f' % (
+                    max_age, result['connections'], result['p50_ms'], result['p99_ms'], result['rps']
+                ))
+        finally:
+            for alias, max_age in original.items():
+                connections.settings[alias]['CONN_MAX_AGE'] = max_age
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from book import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Hold thousands of idle /api/events/ streams on one event loop and '
+        'measure their memory and the time to fan a change out to all of them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, nargs='+', default=[1000, 5000, 10000])
+        parser.add_argument('--events', type=int, default=20, help='Changes published per run.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('%12s %12s %14s %14s' % ('connections', 'KB/stream', 'fanout p50 ms', 'fanout p99 ms'))
+        for connections in options['connections']:
+            result = benchmark.run_idle_streams(connections, options['events'])
+            self.stdout.write('%12d %12.2f %14.3f %14.3f' % (
+                result['connections'], result['kb_per_connection'], result['fanout_p50_ms'], result['fanout_p99_ms']
+            ))
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from book import partitions
+from book.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        'Create book_book partitions for the current period and the next --ahead '
+        'periods (BOOK_PARTITION_INTERVAL). Run it from cron so inserts never '
+        'land in the default partition.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3)
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='Partition book_book first if it is still a plain table (rewrites the whole table).'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+        interval = partitions.get_interval()
+        if not interval:
+            raise CommandError('Set BOOK_PARTITION_INTERVAL to "month" or "year".')
+
+        if not partitions.is_partitioned(connection):
+            if not options['convert']:
+                raise CommandError('book_book is not partitioned; rerun with --convert.')
+            with connection.schema_editor() as schema_editor:
+                partitions.partition_table(schema_editor, Book, interval, ahead=options['ahead'])
+            self.stdout.write(self.style.SUCCESS('Partitioned book_book by %s.' % interval))
+            return
+
+        today = datetime.now(timezone.utc).date()
+        with connection.schema_editor() as schema_editor:
+            created = partitions.ensure_partitions(
+                schema_editor, today, partitions.periods_ahead(options['ahead'], interval), interval
+            )
+        for name in created:
+            self.stdout.write('Created %s' % name)
+        self.stdout.write(self.style.SUCCESS('%d partitions created.' % len(created)))
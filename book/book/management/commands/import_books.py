@@ -0,0 +1,58 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from book.importers import BookImporter, RowError, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Import books from a CSV or XLSX file with title, category, company, '
+        'publish_date and user columns. Missing categories and companies are created.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Write books with COPY through a temporary table (PostgreSQL only).'
+        )
+        parser.add_argument('--skip-errors', action='store_true', help='Report invalid rows instead of stopping.')
+        parser.add_argument('--checkpoint', default=None, help='Defaults to <path>.checkpoint.')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows recorded in the checkpoint.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError('File "%s" does not exist.' % path)
+        if options['copy'] and connection.vendor != 'postgresql':
+            self.stderr.write('COPY needs PostgreSQL; falling back to bulk_create.')
+
+        checkpoint = options['checkpoint'] or '%s.checkpoint' % path
+        importer = BookImporter(
+            chunk_size=options['chunk_size'],
+            use_copy=options['copy'],
+            skip_errors=options['skip_errors'],
+            checkpoint=checkpoint,
+        )
+        started = time.perf_counter()
+
+        def progress(rows, imported, errors):
+            elapsed = time.perf_counter() - started
+            self.stdout.write('%d rows read, %d imported, %d skipped (%.0f rows/s)' % (
+                rows, imported, errors, imported / elapsed if elapsed else 0
+            ))
+
+        try:
+            importer.run(read_rows(path), resume=options['resume'], progress=progress)
+        except RowError as error:
+            raise CommandError('%s Rerun with --resume to continue after fixing it.' % error)
+
+        for error in importer.errors[:20]:
+            self.stderr.write(str(error))
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS('Imported %d books.' % importer.imported))
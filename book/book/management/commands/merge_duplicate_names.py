@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from book.cache import invalidate
+from book import changes, listing
+from book.dedup import merge_duplicates
+from book.models import Book, BookStat, Category, Change, Company
+
+
+class Command(BaseCommand):
+    help = (
+        'Merge categories and companies whose names only differ by case, '
+        'repointing their books. Run it before migrating large tables so the '
+        'unique name migration has nothing left to merge.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Duplicate groups merged per transaction.')
+
+    def handle(self, *args, **options):
+        for model, field in ((Category, 'category'), (Company, 'company')):
+            merged = merge_duplicates(model, field, Book, BookStat, batch_size=options['batch_size'], on_repoint=self.books_repointed)
+            if merged:
+                invalidate(model)
+                invalidate(Book)
+            self.stdout.write(self.style.SUCCESS('Merged %d duplicate %s rows.' % (merged, field)))
+
+    def books_repointed(self, book_ids):
+        if changes.change_log_enabled():
+            changes.record(Book, [Book(pk=pk) for pk in book_ids], Change.Action.UPDATED)
+        if listing.listing_enabled():
+            listing.refresh(book_ids)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from book.listing import rebuild
+from book.models import BookListing
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized BookListing table from the book, category, company and user tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Rebuilt %d book listing rows.' % BookListing.objects.count()))
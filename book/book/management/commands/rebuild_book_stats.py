@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from book.models import BookStat
+from book.stats import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the BookStat summary table from the book table.'
+
+    def handle(self, *args, **options):
+        rebuild_summary()
+        self.stdout.write(self.style.SUCCESS('Rebuilt %d book stat rows.' % BookStat.objects.count()))
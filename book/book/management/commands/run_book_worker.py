@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from book.jobs import claim_next, run_job
+from book.models import Job
+from book.tasks import prune_exports
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs. Start as many workers as needed; each job runs once. '
+        'Workers also delete export files older than BOOK_TASK_EXPORT_RETENTION_SECONDS.'
+    )
+    prune_interval = 3600
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds between polls of an empty queue.')
+        parser.add_argument('--max-jobs', type=int, default=None)
+
+    def handle(self, *args, **options):
+        processed = 0
+        next_prune = 0
+        while options['max_jobs'] is None or processed < options['max_jobs']:
+            if time.monotonic() >= next_prune:
+                prune_exports(getattr(settings, 'BOOK_TASK_EXPORT_RETENTION_SECONDS', 86400))
+                next_prune = time.monotonic() + self.prune_interval
+            close_old_connections()
+            job = claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            started = time.perf_counter()
+            run_job(job)
+            processed += 1
+            style = self.style.SUCCESS if job.status == Job.Status.SUCCEEDED else self.style.ERROR
+            self.stdout.write(style('Job %d %s %s in %.2fs' % (job.pk, job.task, job.status, time.perf_counter() - started)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from book.benchmark import seed
+
+
+class Command(BaseCommand):
+    help = 'Insert users, categories, companies and books for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--companies', type=int, default=10)
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        seed(
+            categories=options['categories'],
+            companies=options['companies'],
+            books=options['books'],
+            users=options['users'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS('Seeded %d books.' % options['books']))
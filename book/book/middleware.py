@@ -0,0 +1,103 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from book.cache import KEY_PREFIX, get_cache
+from book.profiling import Profile, current_profile, registry
+from book.routers import get_replicas, replica_reads
+
+
+class ProfilingMiddleware:
+    """
+    Records query count, DB time, serializer time and total time for every
+    request, aggregates them per view into the histograms served at
+    ``/metrics``, and reports them in a ``Server-Timing`` header.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        token = current_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        total = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.observe((('method', request.method), ('view', view)), profile, total)
+
+        response['Server-Timing'] = ', '.join([
+            'db;dur=%.3f;desc="%d queries"' % (profile.db_time * 1000, profile.queries),
+            'serializer;dur=%.3f' % (profile.serializer_time * 1000),
+            'total;dur=%.3f' % (total * 1000),
+        ])
+
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets ``ReplicaRouter`` send reads to replicas for safe-method requests.
+
+    After a client writes, it is pinned to the primary for
+    ``BOOK_REPLICA_PIN_SECONDS`` so it reads its own writes while replicas
+    catch up. Clients are told apart by their ``Authorization`` header,
+    falling back to the remote address. Cached and ETagged responses are
+    still built from the primary; see ``CachedResponseMixin``.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_pin_key(self, request):
+        client = request.META.get('HTTP_AUTHORIZATION') or request.META.get('REMOTE_ADDR', '')
+
+        return '%s:pin:%s' % (KEY_PREFIX, hashlib.sha256(client.encode()).hexdigest())
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        key = self.get_pin_key(request)
+        if request.method not in self.safe_methods:
+            response = self.get_response(request)
+            get_cache().set(key, True, getattr(settings, 'BOOK_REPLICA_PIN_SECONDS', 5))
+            return response
+
+        token = replica_reads.set(not get_cache().get(key))
+        try:
+            return self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Reports the budget of the throttle bucket a request was charged to in
+    ``X-RateLimit-*`` headers.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            scope, limit, remaining = rate_limit
+            response['X-RateLimit-Scope'] = scope
+            response['X-RateLimit-Limit'] = limit
+            response['X-RateLimit-Remaining'] = remaining
+
+        return response
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['publish_date', 'id'], name='book_publish_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+
+import book.operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0003_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'publish_date'], name='book_category_publish_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['company', 'publish_date'], name='book_company_publish_idx'),
+        ),
+        book.operations.AddPostgresIndex(
+            model_name='book',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', config='simple'), name='book_title_search_idx'),
+        ),
+    ]
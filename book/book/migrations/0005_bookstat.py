@@ -0,0 +1,27 @@
+# Generated by Django 4.0.5 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0004_book_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('books', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='book.category')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='book.company')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('category', 'company', 'month'), name='book_stat_unique_group')],
+            },
+        ),
+    ]
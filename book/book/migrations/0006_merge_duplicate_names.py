@@ -0,0 +1,23 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:01
+
+from django.db import migrations
+
+from book.dedup import merge_duplicates
+
+
+def merge_names(apps, schema_editor):
+    Book = apps.get_model('book', 'Book')
+    BookStat = apps.get_model('book', 'BookStat')
+    merge_duplicates(apps.get_model('book', 'Category'), 'category', Book, BookStat)
+    merge_duplicates(apps.get_model('book', 'Company'), 'company', Book, BookStat)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0005_bookstat'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:02
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0006_merge_duplicate_names'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='category',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('category'), name='book_category_name_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='company',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('company'), name='book_company_name_unique'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:09
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import book.operations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0008_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookListing',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=64)),
+                ('publish_date', models.DateTimeField()),
+                ('category_name', models.CharField(max_length=32)),
+                ('company_name', models.CharField(max_length=64)),
+                ('company_address', models.CharField(max_length=128)),
+                ('company_phone', models.CharField(max_length=32)),
+                ('username', models.CharField(max_length=150)),
+                ('category', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='book.category')),
+                ('company', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='book.company')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['publish_date', 'id'], name='listing_publish_date_id_idx'), models.Index(fields=['category', 'publish_date'], name='listing_category_publish_idx'), models.Index(fields=['company', 'publish_date'], name='listing_company_publish_idx')],
+            },
+        ),
+        book.operations.AddPostgresIndex(
+            model_name='booklisting',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', config='simple'), name='listing_title_search_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:14
+
+from django.db import migrations
+from django.db.migrations.exceptions import IrreversibleError
+
+from book import partitions
+
+
+def partition_book(apps, schema_editor):
+    interval = partitions.get_interval()
+    if not interval or partitions.is_partitioned(schema_editor.connection):
+        return
+    partitions.partition_table(schema_editor, apps.get_model('book', 'Book'), interval)
+
+
+def unpartition_book(apps, schema_editor):
+    if partitions.is_partitioned(schema_editor.connection):
+        raise IrreversibleError('book_book is partitioned; unpartitioning it is not supported.')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0009_booklisting'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_book, unpartition_book),
+    ]
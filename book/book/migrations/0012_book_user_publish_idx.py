@@ -0,0 +1,17 @@
+# Generated by Django 4.0.5 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0011_change'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['user', 'publish_date'], name='book_user_publish_idx'),
+        ),
+    ]
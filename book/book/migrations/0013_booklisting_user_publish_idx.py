@@ -0,0 +1,19 @@
+# Generated by Django 4.0.5 on 2026-10-18 20:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0012_book_user_publish_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booklisting',
+            index=models.Index(fields=['user', 'publish_date'], name='listing_user_publish_idx'),
+        ),
+    ]
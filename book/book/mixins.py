@@ -0,0 +1,237 @@
+from copy import copy
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from book.signals import bulk_saved
+from book.values import ValuesSerializer
+
+
+class BulkModelMixin:
+    """
+    Adds ``/bulk/`` to a model viewset: POST creates, PUT/PATCH updates and
+    DELETE removes a list of rows in a single transaction.
+
+    Foreign keys are checked with one ``IN`` query per relation up front, and
+    rows are written with ``bulk_create``/``bulk_update``. Those skip model
+    signals, so ``bulk_saved`` is sent instead. Nothing is written unless
+    every item validates; otherwise a 400 is returned with one error entry
+    per item, in request order.
+    """
+    bulk_batch_size = 1000
+    bulk_max_items = 50000
+
+    @action(detail=False, methods=['post', 'put', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': ['At most %d items are allowed.' % self.bulk_max_items]})
+
+        if request.method == 'POST':
+            return self.bulk_create(items)
+        if request.method == 'DELETE':
+            return self.bulk_destroy(items)
+        return self.bulk_update(items, partial=request.method == 'PATCH')
+
+    def get_bulk_context(self, items):
+        related_ids = {}
+        for name, field in self.get_serializer_class()().fields.items():
+            if field.read_only or not isinstance(field, serializers.PrimaryKeyRelatedField):
+                continue
+            queryset = field.get_queryset()
+            values = set()
+            for item in items:
+                try:
+                    values.add(queryset.model._meta.pk.to_python(item[name]))
+                except (KeyError, TypeError, DjangoValidationError):
+                    continue
+            related_ids[name] = set(queryset.filter(pk__in=values).values_list('pk', flat=True))
+
+        context = self.get_serializer_context()
+        context['bulk_related_ids'] = related_ids
+
+        return context
+
+    def validate_bulk(self, items, instances=None, partial=False):
+        serializer_class = self.get_serializer_class()
+        context = self.get_bulk_context(items)
+        serializers_, errors = [], []
+        for index, item in enumerate(items):
+            instance = None
+            if instances is not None:
+                instance = instances.get(index)
+                if instance is None:
+                    serializers_.append(None)
+                    errors.append({'id': ['Not found.']})
+                    continue
+            serializer = serializer_class(instance, data=item, partial=partial, context=context)
+            serializer.is_valid()
+            serializers_.append(serializer)
+            errors.append(serializer.errors)
+
+        if any(errors):
+            raise ValidationError(errors)
+
+        return serializers_
+
+    def bulk_create(self, items):
+        model = self.get_queryset().model
+        validated = self.validate_bulk(items)
+        objs = [model(**serializer.validated_data) for serializer in validated]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objs, batch_size=self.bulk_batch_size)
+                bulk_saved.send(sender=model, instances=objs, previous=None)
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': ['Items conflict with each other.']})
+
+        return Response(self.get_serializer(objs, many=True).data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, items, partial=False):
+        queryset = self.get_queryset()
+        pks = [item.get('id') if isinstance(item, dict) else None for item in items]
+        try:
+            found = queryset.in_bulk([pk for pk in pks if pk is not None])
+        except (TypeError, ValueError, DjangoValidationError):
+            raise ValidationError({'non_field_errors': ['Every item needs a valid "id".']})
+        instances = {index: found.get(pk) for index, pk in enumerate(pks)}
+
+        validated = self.validate_bulk(items, instances=instances, partial=partial)
+        fields = set()
+        objs = []
+        previous = []
+        for serializer in validated:
+            previous.append(copy(serializer.instance))
+            for attr, value in serializer.validated_data.items():
+                setattr(serializer.instance, attr, value)
+                fields.add(attr)
+            objs.append(serializer.instance)
+        if fields:
+            for field in queryset.model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for obj in objs:
+                        field.pre_save(obj, add=False)
+                    fields.add(field.name)
+            try:
+                with transaction.atomic():
+                    queryset.model.objects.bulk_update(objs, sorted(fields), batch_size=self.bulk_batch_size)
+                    bulk_saved.send(sender=queryset.model, instances=objs, previous=previous)
+            except IntegrityError:
+                raise ValidationError({'non_field_errors': ['Items conflict with each other.']})
+
+        return Response(self.get_serializer(objs, many=True).data)
+
+    def bulk_destroy(self, items):
+        queryset = self.get_queryset()
+        try:
+            pks = [queryset.model._meta.pk.to_python(item) for item in items]
+        except (TypeError, DjangoValidationError):
+            raise ValidationError({'non_field_errors': ['Expected a list of ids.']})
+
+        with transaction.atomic():
+            existing = set(queryset.filter(pk__in=pks).values_list('pk', flat=True))
+            errors = [{} if pk in existing else {'id': ['Not found.']} for pk in pks]
+            if any(errors):
+                raise ValidationError(errors)
+            queryset.filter(pk__in=existing).delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class NameLookupMixin:
+    """
+    Adds ``/lookup/?name=`` to a model viewset, returning the row whose
+    ``name_field`` matches case-insensitively. Filters on ``LOWER(field)``
+    so the lookup is served by the unique ``Lower`` index.
+    """
+    name_field = None
+
+    @action(detail=False, methods=['get'], url_path='lookup', url_name='lookup')
+    def lookup_name(self, request):
+        name = request.query_params.get('name')
+        if not name:
+            raise ValidationError({'name': ['This query parameter is required.']})
+
+        queryset = self.get_queryset().alias(name_key=Lower(self.name_field))
+        obj = get_object_or_404(queryset, name_key=name.lower())
+
+        return Response(self.get_serializer(obj).data)
+
+
+class SparseFieldsMixin:
+    """
+    ``?fields=id,title`` on safe-method requests returns only the listed
+    serializer fields. The selection is passed to the serializer through
+    its context and pushed down to ``QuerySet.only()`` so the other columns
+    are never read. ``sparse_required_fields`` are always loaded, for code
+    that reads them off the instance (e.g. pagination cursors).
+    """
+    sparse_required_fields = ()
+
+    def get_sparse_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in permissions.SAFE_METHODS or 'fields' not in request.query_params:
+            return None
+
+        if not hasattr(self, '_sparse_fields'):
+            requested = [name for name in request.query_params['fields'].split(',') if name]
+            readable = {name: field for name, field in self.serializer_class().fields.items() if not field.write_only}
+            unknown = set(requested) - set(readable)
+            if unknown or not requested:
+                raise ValidationError({'fields': 'Unknown fields: %s.' % ', '.join(sorted(unknown)) if unknown else 'No fields given.'})
+            self._sparse_fields = tuple(name for name in readable if name in requested)
+            self._sparse_columns = tuple(readable[name].source for name in self._sparse_fields)
+
+        return self._sparse_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.get_sparse_fields() is not None:
+            queryset = queryset.only(*self._sparse_columns, *self.sparse_required_fields)
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+
+        return context
+
+
+class ValuesListMixin:
+    """
+    Serves unpaginated ``list`` responses through a ``ValuesSerializer``
+    built from ``serializer_class`` (and the sparse ``fields`` in the
+    serializer context, if any), skipping model instantiation and per-field
+    serializer overhead. Return ``None`` from ``get_values_serializer`` to
+    use the regular serializer.
+    """
+    values_serializers = {}
+
+    def get_values_serializer(self):
+        key = (self.get_serializer_class(), self.get_serializer_context().get('fields'))
+        if key not in self.values_serializers:
+            self.values_serializers[key] = ValuesSerializer(*key)
+
+        return self.values_serializers[key]
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return Response(values_serializer.serialize(queryset))
@@ -1,16 +1,31 @@
 from unicodedata import category
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
     
 
 class Category(models.Model):
     category = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('category'), name='book_category_name_unique'),
+        ]
 
 
 class Company(models.Model):
     company = models.CharField(max_length=64)
     address = models.CharField(max_length=128)
     phone = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('company'), name='book_company_name_unique'),
+        ]
 
 
 class Book(models.Model):
@@ -18,4 +33,95 @@ class Book(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     publish_date = models.DateTimeField()
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
\ No newline at end of file
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['publish_date', 'id'], name='book_publish_date_id_idx'),
+            models.Index(fields=['category', 'publish_date'], name='book_category_publish_idx'),
+            models.Index(fields=['company', 'publish_date'], name='book_company_publish_idx'),
+            models.Index(fields=['user', 'publish_date'], name='book_user_publish_idx'),
+            GinIndex(SearchVector('title', config='simple'), name='book_title_search_idx'),
+        ]
+
+
+class BookStat(models.Model):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE)
+    month = models.DateField()
+    books = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'company', 'month'], name='book_stat_unique_group'),
+        ]
+
+
+class Job(models.Model):
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        SUCCEEDED = 'succeeded'
+        FAILED = 'failed'
+
+    task = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='book_job_status_idx'),
+        ]
+
+
+class BookListing(models.Model):
+    """
+    Denormalized copy of ``Book`` with its category, company and owner
+    columns inlined, so listings (including expanded ones) read a single
+    table. Maintained by ``book.listing`` when ``BOOK_LISTING`` is on.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=64)
+    publish_date = models.DateTimeField()
+    category = models.ForeignKey(Category, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    category_name = models.CharField(max_length=32)
+    company = models.ForeignKey(Company, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    company_name = models.CharField(max_length=64)
+    company_address = models.CharField(max_length=128)
+    company_phone = models.CharField(max_length=32)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    username = models.CharField(max_length=150)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['publish_date', 'id'], name='listing_publish_date_id_idx'),
+            models.Index(fields=['category', 'publish_date'], name='listing_category_publish_idx'),
+            models.Index(fields=['company', 'publish_date'], name='listing_company_publish_idx'),
+            models.Index(fields=['user', 'publish_date'], name='listing_user_publish_idx'),
+            GinIndex(SearchVector('title', config='simple'), name='listing_title_search_idx'),
+        ]
+
+
+class Change(models.Model):
+    """
+    Append-only log of book, category and company writes read by
+    ``/api/changes/``. The auto-incrementing ``id`` is the sequence number
+    clients sync from.
+    """
+    class Action(models.TextChoices):
+        CREATED = 'created'
+        UPDATED = 'updated'
+        DELETED = 'deleted'
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=Action.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
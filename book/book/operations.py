@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class PostgresOnlyMixin:
+    """
+    Migration operation that only touches the schema on PostgreSQL, like
+    ``django.contrib.postgres.operations.CreateExtension``. The project state
+    is always updated so models and migrations stay in sync on every backend.
+    """
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class AddPostgresIndex(PostgresOnlyMixin, migrations.AddIndex):
+    pass
@@ -0,0 +1,202 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination ordered on ``(publish_date, id)``.
+
+    Pagination only kicks in when the request carries a ``page_size`` or
+    ``cursor`` query parameter, so existing clients keep receiving the plain
+    list. Each page is fetched with a ``WHERE (publish_date, id) > (...)``
+    seek instead of an OFFSET, so page N costs the same as page 1 and rows
+    inserted concurrently never shift the window. Pages always follow that
+    order, so combining them with ``?ordering=`` is rejected with 400 rather
+    than silently ignoring the requested order.
+    """
+    ordering = ('publish_date', 'id')
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+        if api_settings.ORDERING_PARAM in params:
+            raise ValidationError({api_settings.ORDERING_PARAM: 'Paged results are always ordered by publish_date and id.'})
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        date_field, pk_field = self.ordering
+        reverse = self.cursor is not None and self.cursor[2]
+        if reverse:
+            queryset = queryset.order_by('-%s' % date_field, '-%s' % pk_field)
+        else:
+            queryset = queryset.order_by(date_field, pk_field)
+
+        if self.cursor is not None:
+            publish_date, pk, _ = self.cursor
+            lookup = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(
+                Q(**{'%s__%s' % (date_field, lookup): publish_date}) |
+                Q(**{date_field: publish_date, '%s__%s' % (pk_field, lookup): pk})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            value = b64decode(encoded.encode('ascii'), altchars=b'-_').decode('ascii')
+            publish_date, pk, reverse = value.split('|')
+            publish_date = parse_datetime(publish_date)
+            pk = int(pk)
+            reverse = bool(int(reverse))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if publish_date is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return publish_date, pk, reverse
+
+    def encode_cursor(self, instance, reverse):
+        date_field, pk_field = self.ordering
+        value = '%s|%s|%d' % (
+            getattr(instance, date_field).isoformat(),
+            getattr(instance, pk_field),
+            int(reverse),
+        )
+        encoded = b64encode(value.encode('ascii'), altchars=b'-_').decode('ascii')
+
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class JobPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 50
+
+
+class ChangePagination(BasePagination):
+    """
+    Pages through the change log in sequence order. Clients pass the
+    ``since`` of the previous page back until ``has_more`` is false, then
+    keep polling with it; each batch holds at most ``limit`` changes.
+    """
+    page_size = 500
+    max_page_size = 5000
+    page_size_query_param = 'limit'
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        try:
+            self.since = int(request.query_params.get(self.since_query_param, 0))
+        except ValueError:
+            self.since = -1
+        if self.since < 0:
+            raise ValidationError({self.since_query_param: 'Must be a non-negative integer.'})
+        try:
+            page_size = _positive_int(request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            page_size = self.page_size
+
+        results = list(queryset.filter(pk__gt=self.since).order_by('pk')[:page_size + 1])
+        self.has_more = len(results) > page_size
+        self.page = results[:page_size]
+        if self.page:
+            self.since = self.page[-1].pk
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('since', self.since),
+            ('has_more', self.has_more),
+            ('next', replace_query_param(self.base_url, self.since_query_param, self.since)),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'since': {'type': 'integer'},
+                'has_more': {'type': 'boolean'},
+                'next': {'type': 'string'},
+                'results': schema,
+            },
+        }
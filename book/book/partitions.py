@@ -0,0 +1,178 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+TABLE = 'book_book'
+DEFAULT_PARTITION = '%s_default' % TABLE
+INTERVALS = ('month', 'year')
+
+
+def get_interval():
+    interval = getattr(settings, 'BOOK_PARTITION_INTERVAL', '')
+    if interval and interval not in INTERVALS:
+        raise ValueError('BOOK_PARTITION_INTERVAL must be one of: %s.' % ', '.join(INTERVALS))
+
+    return interval
+
+
+def period_start(day, interval):
+    return day.replace(month=1, day=1) if interval == 'year' else day.replace(day=1)
+
+
+def next_period(start, interval):
+    if interval == 'year':
+        return start.replace(year=start.year + 1)
+    if start.month == 12:
+        return start.replace(year=start.year + 1, month=1)
+
+    return start.replace(month=start.month + 1)
+
+
+def periods(first, last, interval):
+    """Yield the start of every period from the one holding ``first`` to the one holding ``last``."""
+    start = period_start(first, interval)
+    while start <= last:
+        yield start
+        start = next_period(start, interval)
+
+
+def periods_ahead(ahead, interval):
+    """Start of the period ``ahead`` periods after the current one."""
+    start = period_start(datetime.now(timezone.utc).date(), interval)
+    for _ in range(ahead):
+        start = next_period(start, interval)
+
+    return start
+
+
+def partition_name(start, interval):
+    if interval == 'year':
+        return '%s_p%d' % (TABLE, start.year)
+
+    return '%s_p%d_%02d' % (TABLE, start.year, start.month)
+
+
+def bound(day):
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc).isoformat()
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(%s)',
+            [TABLE]
+        )
+        return {name for name, in cursor.fetchall()}
+
+
+def create_partition(schema_editor, start, interval):
+    """
+    Create and attach the partition for the period starting at ``start``.
+    Rows for that period already sitting in the default partition are moved
+    into it first, since PostgreSQL refuses to attach a range the default
+    partition holds rows for.
+    """
+    name = partition_name(start, interval)
+    low, high = bound(start), bound(next_period(start, interval))
+    quote = schema_editor.quote_name
+
+    schema_editor.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS)' % (quote(name), quote(TABLE)))
+    schema_editor.execute(
+        'WITH moved AS (DELETE FROM %s WHERE publish_date >= %%s AND publish_date < %%s RETURNING *) '
+        'INSERT INTO %s SELECT * FROM moved' % (quote(DEFAULT_PARTITION), quote(name)),
+        [low, high]
+    )
+    schema_editor.execute(
+        "ALTER TABLE %s ATTACH PARTITION %s FOR VALUES FROM ('%s') TO ('%s')" % (quote(TABLE), quote(name), low, high)
+    )
+
+    return name
+
+
+def ensure_partitions(schema_editor, first, last, interval):
+    """Create the missing partitions covering ``first`` to ``last``. Returns the names created."""
+    existing = existing_partitions(schema_editor.connection)
+    created = []
+    for start in periods(first, last, interval):
+        if partition_name(start, interval) not in existing:
+            created.append(create_partition(schema_editor, start, interval))
+
+    return created
+
+
+def partition_table(schema_editor, book_model, interval, ahead=3):
+    """
+    Rebuild ``book_book`` as a table range-partitioned on ``publish_date``.
+
+    The old table is renamed, a partitioned copy takes its name with one
+    partition per ``interval`` from the oldest book to ``ahead`` periods
+    from now plus a default partition for anything else, rows are copied
+    across and the old table is dropped. Indexes and foreign keys are then
+    recreated on the parent, which propagates them to every partition.
+
+    PostgreSQL requires the partition key in every unique index, so the
+    primary key becomes ``(id, publish_date)``; ids stay unique because
+    they all come from the same sequence.
+    """
+    quote = schema_editor.quote_name
+    execute = schema_editor.execute
+    legacy = '%s_legacy' % TABLE
+
+    # Partitioned tables cannot have identity columns before PostgreSQL 17,
+    # so an identity id (Django 4.1+) is turned into a plain sequence default.
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [TABLE])
+        identity = cursor.fetchone()[0]
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [TABLE, 'id'])
+        sequence = cursor.fetchone()[0]
+    if identity:
+        sequence = '%s_id_seq' % TABLE
+        execute('ALTER TABLE %s ALTER COLUMN id DROP IDENTITY' % quote(TABLE))
+        execute('CREATE SEQUENCE %s' % quote(sequence))
+        execute("ALTER TABLE %s ALTER COLUMN id SET DEFAULT nextval('%s')" % (quote(TABLE), sequence))
+
+    execute('ALTER TABLE %s RENAME TO %s' % (quote(TABLE), quote(legacy)))
+    execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS) PARTITION BY RANGE (publish_date)' % (quote(TABLE), quote(legacy)))
+    execute('ALTER SEQUENCE %s OWNED BY %s.id' % (sequence, quote(TABLE)))
+    execute('CREATE TABLE %s PARTITION OF %s DEFAULT' % (quote(DEFAULT_PARTITION), quote(TABLE)))
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(publish_date) FROM %s' % quote(legacy))
+        oldest = cursor.fetchone()[0]
+    today = datetime.now(timezone.utc).date()
+    ensure_partitions(schema_editor, oldest.astimezone(timezone.utc).date() if oldest else today, periods_ahead(ahead, interval), interval)
+
+    execute('INSERT INTO %s SELECT * FROM %s' % (quote(TABLE), quote(legacy)))
+    execute(
+        "SELECT setval('%s', GREATEST((SELECT COALESCE(MAX(id), 0) FROM %s), (SELECT last_value FROM %s)))"
+        % (sequence, quote(TABLE), sequence)
+    )
+    execute('DROP TABLE %s' % quote(legacy))
+
+    execute('ALTER TABLE %s ADD CONSTRAINT %s PRIMARY KEY (id, publish_date)' % (quote(TABLE), quote('%s_pkey' % TABLE)))
+    for field in book_model._meta.concrete_fields:
+        if field.remote_field is None:
+            continue
+        execute(
+            'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s (%s) DEFERRABLE INITIALLY DEFERRED' % (
+                quote(TABLE),
+                quote('%s_%s_fk' % (TABLE, field.column)),
+                quote(field.column),
+                quote(field.related_model._meta.db_table),
+                quote(field.target_field.column),
+            )
+        )
+        execute('CREATE INDEX %s ON %s (%s)' % (quote('%s_%s_idx' % (TABLE, field.column)), quote(TABLE), quote(field.column)))
+    for index in book_model._meta.indexes:
+        schema_editor.add_index(book_model, index)
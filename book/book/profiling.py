@@ -0,0 +1,120 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from book.cache import cache_stats
+
+
+current_profile = ContextVar('book_profile', default=None)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Profile:
+    """Timings collected while serving a single request."""
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Add the time spent in the outermost ``to_representation`` call to the
+    current request's profile. Nested calls are covered by the outer one.
+    """
+    profile = current_profile.get()
+    if profile is None or profile.serializer_depth:
+        yield
+        return
+
+    profile.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serializer_time += time.perf_counter() - start
+        profile.serializer_depth -= 1
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe per-view histograms, rendered in Prometheus text format."""
+    metrics = (
+        ('book_request_duration_seconds', 'Total time spent serving the request.', SECONDS_BUCKETS),
+        ('book_request_db_seconds', 'Time spent executing SQL.', SECONDS_BUCKETS),
+        ('book_request_serializer_seconds', 'Time spent in serializer to_representation.', SECONDS_BUCKETS),
+        ('book_request_queries', 'SQL queries executed per request.', QUERY_BUCKETS),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {name: {} for name, _, _ in self.metrics}
+
+    def observe(self, labels, profile, total):
+        values = {
+            'book_request_duration_seconds': total,
+            'book_request_db_seconds': profile.db_time,
+            'book_request_serializer_seconds': profile.serializer_time,
+            'book_request_queries': profile.queries,
+        }
+        with self.lock:
+            for name, _, buckets in self.metrics:
+                histogram = self.histograms[name].get(labels)
+                if histogram is None:
+                    histogram = self.histograms[name][labels] = Histogram(buckets)
+                histogram.observe(values[name])
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, description, _ in self.metrics:
+                lines.append('# HELP %s %s' % (name, description))
+                lines.append('# TYPE %s histogram' % name)
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    label_text = ','.join('%s="%s"' % pair for pair in labels)
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += bucket_count
+                        lines.append('%s_bucket{%s,le="%s"} %d' % (name, label_text, bound, cumulative))
+                    lines.append('%s_sum{%s} %s' % (name, label_text, repr(float(histogram.sum))))
+                    lines.append('%s_count{%s} %d' % (name, label_text, histogram.count))
+
+        stats = cache_stats()
+        for key in ('hits', 'misses'):
+            lines.append('# TYPE book_response_cache_%s_total counter' % key)
+            lines.append('book_response_cache_%s_total %d' % (key, stats[key]))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,36 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` backed by orjson when it is installed.
+
+    Output matches ``JSONRenderer`` with the default compact, unicode
+    settings, except for floats: date/time values and anything else orjson
+    does not handle natively go through DRF's ``JSONEncoder.default``.
+    Floats use orjson's own formatting (``1e20`` and ``1e-7`` rather than
+    ``1e+20`` and ``1e-07``, the same values when parsed), and NaN and
+    infinities render as ``null`` where ``JSONRenderer`` raises
+    ``ValueError``. No endpoint renders floats today. Indented output,
+    ASCII-only output and data orjson rejects use the stock renderer.
+    """
+    options = orjson and (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
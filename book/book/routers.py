@@ -0,0 +1,55 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+# Set by ReplicaRoutingMiddleware for requests that may read from a replica.
+replica_reads = ContextVar('book_replica_reads', default=False)
+
+
+def get_replicas():
+    return getattr(settings, 'BOOK_READ_REPLICAS', [])
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read from ``default`` inside the block, for results stored or tagged
+    under version counters the primary has already bumped.
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of ``book`` models to a random replica while serving a
+    safe-method request that is not pinned to the primary. Everything else,
+    including reads outside a request, goes to ``default``.
+    """
+    app_label = 'book'
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if model._meta.app_label != self.app_label or not replicas or not replica_reads.get():
+            return None
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
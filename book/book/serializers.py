@@ -1,30 +1,86 @@
 from dataclasses import fields
 from pyexpat import model
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth.models import User as UserModel
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models.functions import Lower
 
-from book.models import Category, Company, Book
+from book.jobs import registry
+from book.models import Category, Company, Book, Job
+from book.profiling import serializer_timer
 
 
-class BookSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Book
-        fields = ('id', 'title', 'category', 'company', 'publish_date', 'user')
+class ProfiledSerializerMixin:
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+
+class SparseFieldsSerializerMixin:
+    """Keeps only the fields listed in ``context['fields']``, when set."""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Behaves like ``PrimaryKeyRelatedField`` unless the serializer context
+    carries ``bulk_related_ids``, in which case the reference is checked
+    against the ids prefetched for the whole batch instead of querying once
+    per row.
+    """
+    def to_internal_value(self, data):
+        related_ids = self.context.get('bulk_related_ids', {}).get(self.field_name)
+        if related_ids is None:
+            return super().to_internal_value(data)
+
+        model = self.get_queryset().model
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = model._meta.pk.to_python(data)
+        except (TypeError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in related_ids:
+            self.fail('does_not_exist', pk_value=data)
+
+        return model(pk=pk)
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CaseInsensitiveUniqueValidator(UniqueValidator):
+    """
+    Rejects names that already exist in any letter case. Compares
+    ``LOWER(field)`` so the check runs against the unique ``Lower`` index.
+    """
+    def filter_queryset(self, value, queryset, field_name):
+        return queryset.alias(name_key=Lower(field_name)).filter(name_key=value.lower())
+
+
+class CategorySerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ('id', 'category')
+        extra_kwargs = {
+            'category': {'validators': [CaseInsensitiveUniqueValidator(queryset=Category.objects.all())]},
+        }
 
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Company
         fields = ('id', 'company', 'address', 'phone')
+        extra_kwargs = {
+            'company': {'validators': [CaseInsensitiveUniqueValidator(queryset=Company.objects.all())]},
+        }
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     def create(self, validated_data):
@@ -37,4 +93,98 @@ class UserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserModel
-        fields = ('id', 'username', 'password')
\ No newline at end of file
+        fields = ('id', 'username', 'password')
+
+
+class BookSerializer(ProfiledSerializerMixin, SparseFieldsSerializerMixin, serializers.ModelSerializer):
+    serializer_related_field = BulkPrimaryKeyRelatedField
+    expandable_fields = {
+        'category': CategorySerializer,
+        'company': CompanySerializer,
+        'user': UserSerializer,
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        for field_name in self.context.get('expand', ()):
+            if field_name in self.fields:
+                self.fields[field_name] = self.expandable_fields[field_name](read_only=True)
+
+    def validate_user(self, user):
+        request = self.context.get('request')
+        if request is not None and not request.user.is_staff and user.pk != request.user.pk:
+            raise serializers.ValidationError('You can only add books for yourself.')
+
+        return user
+
+    class Meta:
+        model = Book
+        fields = ('id', 'title', 'category', 'company', 'publish_date', 'user')
+
+
+class BookListingSerializer(ProfiledSerializerMixin, serializers.BaseSerializer):
+    """
+    Renders ``BookListing`` rows exactly like ``BookSerializer`` renders the
+    books they copy, honouring ``expand`` and ``fields`` in the context,
+    without touching any other table.
+    """
+    publish_date_field = serializers.DateTimeField()
+
+    def to_representation(self, listing):
+        expand = self.context.get('expand', ())
+        data = {
+            'id': listing.id,
+            'title': listing.title,
+            'category': listing.category_id,
+            'company': listing.company_id,
+            'publish_date': self.publish_date_field.to_representation(listing.publish_date),
+            'user': listing.user_id,
+        }
+        if 'category' in expand:
+            data['category'] = {'id': listing.category_id, 'category': listing.category_name}
+        if 'company' in expand:
+            data['company'] = {
+                'id': listing.company_id,
+                'company': listing.company_name,
+                'address': listing.company_address,
+                'phone': listing.company_phone,
+            }
+        if 'user' in expand:
+            data['user'] = {'id': listing.user_id, 'username': listing.username}
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            data = {name: data[name] for name in fields}
+
+        return data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    def validate_task(self, value):
+        task = registry.get(value)
+        if task is None:
+            raise serializers.ValidationError('Unknown task.')
+        if task.staff_only and not self.context['request'].user.is_staff:
+            raise serializers.ValidationError('Only staff can run this task.')
+
+        return value
+
+    def validate_payload(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Expected an object.')
+
+        return value
+
+    def validate(self, attrs):
+        payload = registry[attrs['task']].payload_serializer(data=attrs.get('payload', {}))
+        if not payload.is_valid():
+            raise serializers.ValidationError({'payload': payload.errors})
+        attrs['payload'] = dict(payload.validated_data)
+
+        return attrs
+
+    class Meta:
+        model = Job
+        fields = ('id', 'task', 'payload', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('status', 'result', 'error', 'created_at', 'started_at', 'finished_at')
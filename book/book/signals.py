@@ -0,0 +1,147 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from book import changes, events, listing, stats
+from book.cache import invalidate
+from book.models import Book, Category, Change, Company
+
+
+# Sent by the bulk endpoints, which write with bulk_create/bulk_update and
+# therefore skip post_save. ``previous`` holds copies of the instances as they
+# were before an update, or is None for creates.
+bulk_saved = Signal()
+
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Company)
+@receiver(bulk_saved)
+def invalidate_cached_responses(sender, **kwargs):
+    invalidate(sender)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_responses_with_users(sender, update_fields=None, **kwargs):
+    # Books expand their user's username; logins only touch last_login.
+    if update_fields is None or 'username' in update_fields:
+        invalidate(sender)
+
+
+def stats_group(book):
+    return stats.group_of(book.category_id, book.company_id, book.publish_date)
+
+
+@receiver(pre_save, sender=Book)
+def remember_stats_group(sender, instance, **kwargs):
+    if not stats.summary_enabled() or instance._state.adding:
+        return
+
+    previous = sender.objects.filter(pk=instance.pk).values_list('category_id', 'company_id', 'publish_date').first()
+    instance._stats_group = previous and stats.group_of(*previous)
+
+
+@receiver(post_save, sender=Book)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    if not stats.summary_enabled():
+        return
+
+    previous = None if created else getattr(instance, '_stats_group', None)
+    stats.record_changes(removed=[previous] if previous else [], added=[stats_group(instance)])
+
+
+@receiver(post_delete, sender=Book)
+def update_stats_on_delete(sender, instance, **kwargs):
+    if stats.summary_enabled():
+        stats.record_changes(removed=[stats_group(instance)])
+
+
+@receiver(bulk_saved, sender=Book)
+def update_stats_on_bulk_save(sender, instances, previous=None, **kwargs):
+    if stats.summary_enabled():
+        stats.record_changes(
+            removed=[stats_group(book) for book in previous or ()],
+            added=[stats_group(book) for book in instances]
+        )
+
+
+@receiver(post_save, sender=Book)
+def refresh_listing_on_save(sender, instance, **kwargs):
+    if listing.listing_enabled():
+        listing.refresh([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def remove_listing_on_delete(sender, instance, **kwargs):
+    if listing.listing_enabled():
+        listing.remove([instance.pk])
+
+
+@receiver(bulk_saved, sender=Book)
+def refresh_listing_on_bulk_save(sender, instances, **kwargs):
+    if listing.listing_enabled():
+        listing.refresh([book.pk for book in instances])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=User)
+def rename_listings_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if not listing.listing_enabled() or created:
+        return
+    # e.g. logins save the user with update_fields=['last_login'].
+    if update_fields is not None and not set(listing.LISTED_FIELDS[sender]) & set(update_fields):
+        return
+    listing.rename(sender, [instance])
+
+
+@receiver(bulk_saved, sender=Category)
+@receiver(bulk_saved, sender=Company)
+def rename_listings_on_bulk_save(sender, instances, previous=None, **kwargs):
+    if listing.listing_enabled() and previous is not None:
+        listing.rename(sender, instances)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Company)
+def record_change_on_save(sender, instance, created, **kwargs):
+    if changes.change_log_enabled():
+        changes.record(sender, [instance], Change.Action.CREATED if created else Change.Action.UPDATED)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Company)
+def record_change_on_delete(sender, instance, **kwargs):
+    if changes.change_log_enabled():
+        changes.record(sender, [instance], Change.Action.DELETED)
+
+
+@receiver(bulk_saved, sender=Book)
+@receiver(bulk_saved, sender=Category)
+@receiver(bulk_saved, sender=Company)
+def record_changes_on_bulk_save(sender, instances, previous=None, **kwargs):
+    if changes.change_log_enabled():
+        changes.record(sender, instances, Change.Action.CREATED if previous is None else Change.Action.UPDATED)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Company)
+def push_event_on_save(sender, instance, created, **kwargs):
+    events.notify(sender, [instance], Change.Action.CREATED if created else Change.Action.UPDATED)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Company)
+def push_event_on_delete(sender, instance, **kwargs):
+    events.notify(sender, [instance], Change.Action.DELETED)
+
+
+@receiver(bulk_saved, sender=Book)
+@receiver(bulk_saved, sender=Category)
+@receiver(bulk_saved, sender=Company)
+def push_events_on_bulk_save(sender, instances, previous=None, **kwargs):
+    events.notify(sender, instances, Change.Action.CREATED if previous is None else Change.Action.UPDATED)
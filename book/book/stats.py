@@ -0,0 +1,104 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from book.models import Book, BookStat, Category, Company
+
+
+def summary_enabled():
+    return getattr(settings, 'BOOK_STATS_SUMMARY', False)
+
+
+def month_of(moment):
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def group_of(category_id, company_id, publish_date):
+    return category_id, company_id, month_of(publish_date)
+
+
+def apply_deltas(deltas):
+    """
+    Add ``deltas`` (a mapping of ``(category_id, company_id, month)`` to a
+    book count change) to the ``BookStat`` summary rows.
+    """
+    for (category_id, company_id, month), delta in deltas.items():
+        if not delta:
+            continue
+        group = BookStat.objects.filter(category_id=category_id, company_id=company_id, month=month)
+        if group.update(books=F('books') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                BookStat.objects.create(category_id=category_id, company_id=company_id, month=month, books=delta)
+        except IntegrityError:
+            group.update(books=F('books') + delta)
+
+
+def record_changes(removed=(), added=()):
+    deltas = Counter()
+    for group in removed:
+        deltas[group] -= 1
+    for group in added:
+        deltas[group] += 1
+    apply_deltas(deltas)
+
+
+def rebuild_summary():
+    rows = (
+        Book.objects
+        .annotate(month=TruncMonth('publish_date', output_field=DateField()))
+        .values('category_id', 'company_id', 'month')
+        .annotate(books=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        BookStat.objects.all().delete()
+        BookStat.objects.bulk_create((BookStat(**row) for row in rows.iterator()), batch_size=1000)
+
+
+def books_per_category():
+    if summary_enabled():
+        books = Coalesce(Sum('bookstat__books'), 0)
+    else:
+        books = Count('book')
+
+    return Category.objects.annotate(books=books).values('id', 'category', 'books').order_by('id')
+
+
+def books_per_company():
+    if summary_enabled():
+        books = Coalesce(Sum('bookstat__books'), 0)
+    else:
+        books = Count('book')
+
+    return Company.objects.annotate(books=books).values('id', 'company', 'books').order_by('id')
+
+
+def books_per_month(queryset=None):
+    if queryset is None and summary_enabled():
+        return (
+            BookStat.objects
+            .values('month')
+            .annotate(books=Sum('books'))
+            .filter(books__gt=0)
+            .order_by('month')
+        )
+
+    if queryset is None:
+        queryset = Book.objects.all()
+
+    return (
+        queryset
+        .annotate(month=TruncMonth('publish_date', output_field=DateField()))
+        .values('month')
+        .annotate(books=Count('id'))
+        .order_by('month')
+    )
@@ -0,0 +1,103 @@
+import os
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import QueryDict
+from rest_framework import serializers
+
+from book.exports import iter_serialized, json_array_stream, ndjson_stream
+from book.filters import BookFilterBackend
+from book.importers import BookImporter, read_rows
+from book.jobs import task
+from book.models import Book, BookStat
+from book.serializers import BookSerializer
+from book.stats import rebuild_summary
+
+
+EXPORT_FORMATS = {
+    'ndjson': ndjson_stream,
+    'json': json_array_stream,
+}
+
+
+def task_path(*parts):
+    path = os.path.join(settings.BOOK_TASK_FILES_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    return path
+
+
+def prune_exports(max_age):
+    """Delete export files written more than ``max_age`` seconds ago. Returns how many were removed."""
+    directory = os.path.join(settings.BOOK_TASK_FILES_DIR, 'exports')
+    if not os.path.isdir(directory):
+        return 0
+
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            os.remove(entry.path)
+            removed += 1
+
+    return removed
+
+
+class ImportPayloadSerializer(serializers.Serializer):
+    path = serializers.CharField()
+    chunk_size = serializers.IntegerField(min_value=1, max_value=50000, default=5000)
+    skip_errors = serializers.BooleanField(default=False)
+
+
+class ExportPayloadSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='ndjson')
+    params = serializers.DictField(child=serializers.CharField(), default=dict)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=10000, default=2000)
+
+
+@task(staff_only=True, payload_serializer=ImportPayloadSerializer)
+def import_books(job, path, chunk_size=5000, skip_errors=False):
+    """
+    Runs the import from a checkpoint, so a retried job picks up where it
+    stopped. The file is deleted afterwards, so only uploads saved by
+    ``/api/book/import/`` are accepted.
+    """
+    imports = os.path.realpath(os.path.join(settings.BOOK_TASK_FILES_DIR, 'imports'))
+    if os.path.dirname(os.path.realpath(path)) != imports:
+        raise ValueError('Only files uploaded to /api/book/import/ can be imported.')
+
+    importer = BookImporter(chunk_size=chunk_size, skip_errors=skip_errors, checkpoint='%s.checkpoint' % path)
+    importer.run(read_rows(path), resume=True)
+    os.remove(path)
+    if os.path.exists(importer.checkpoint):
+        os.remove(importer.checkpoint)
+
+    return {'imported': importer.imported, 'errors': [str(error) for error in importer.errors[:100]]}
+
+
+@task(staff_only=True)
+def rebuild_book_stats(job):
+    rebuild_summary()
+
+    return {'rows': BookStat.objects.count()}
+
+
+@task(staff_only=True, payload_serializer=ExportPayloadSerializer)
+def export_books(job, output='ndjson', params=None, chunk_size=2000):
+    """
+    Writes ``/api/book/export/`` output, filtered by ``params``, to a file
+    served by the job until ``prune_exports`` removes it.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError('Output must be one of: %s.' % ', '.join(EXPORT_FORMATS))
+
+    query_params = QueryDict(mutable=True)
+    query_params.update(params or {})
+    queryset = BookFilterBackend().filter_queryset(SimpleNamespace(query_params=query_params), Book.objects.order_by('id'), None)
+
+    path = task_path('exports', 'books-%d.%s' % (job.pk, output))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(EXPORT_FORMATS[output](iter_serialized(queryset, BookSerializer, chunk_size)))
+
+    return {'file': path}
@@ -1,18 +1,61 @@
+import asyncio
+import csv
+import importlib
 import json
-from datetime import datetime
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from io import StringIO
 from webbrowser import get
-from django.urls import reverse
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import CommandError
+from django.urls import clear_url_caches, reverse
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncMonth
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock, skipUnless
+from django.utils import timezone
 from requests import delete
 from rest_framework import status
-from rest_framework.test import APIClient
-
-from book.models import Book, Category, Company
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from book import async_views, benchmark, partitions
+from book.authentication import StatelessJSONWebTokenAuthentication, TokenCache, TokenUser, jwt_create_payload, token_cache
+from book.cache import cache_stats, get_cache, get_versions
+from book.dedup import merge_duplicates
+from book.events import ChangeLogBackend, EventStreamApp, broker
+from book.exports import iter_serialized
+from book.filters import BookFilterBackend
+from book.importers import BookImporter
+from book.management.commands.merge_duplicate_names import Command as MergeDuplicateNames
+from book.models import Book, BookListing, BookStat, Category, Change, Company, Job
+from book.profiling import registry
+from book.renderers import FastJSONRenderer, orjson
+from book.routers import ReplicaRouter
 from book.serializers import BookSerializer, CategorySerializer, CompanySerializer
+from book.stats import rebuild_summary
+from book.throttling import get_store
+from book.values import ValuesSerializer
+from book.views import BookViewSet
 from django.contrib.auth.models import User
 
 
-class CategoryTests(TestCase):
+@override_settings(BOOK_READ_REPLICAS=[])
+class BookTestCase(TestCase):
+    """Reads stay on the default database unless a test opts in to replicas."""
+
+
+class CategoryTests(BookTestCase):
     def setUp(self):
         user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
         self.client = APIClient()
@@ -128,7 +171,7 @@ class CategoryTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class CompanyTests(TestCase):
+class CompanyTests(BookTestCase):
     def setUp(self):
         user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
         self.client = APIClient()
@@ -249,8 +292,10 @@ class CompanyTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class BookTests(TestCase):
+class BookTests(BookTestCase):
     def setUp(self):
+        get_cache().clear()
+
         self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
@@ -373,4 +418,1619 @@ class BookTests(TestCase):
     def test_anonymous_cannot_delete_book(self):
         response = self.delete_book(self.anonymous_client)
 
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class BookPaginationTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        company = Company.objects.create(company='test', address='test', phone='1234567890')
+        category = Category.objects.create(category='food')
+        publish_date = timezone.now()
+        self.books = [
+            Book.objects.create(title='test-%d' % i, category=category, company=company, publish_date=publish_date + timedelta(days=i // 2), user=self.user)
+            for i in range(5)
+        ]
+
+    def get_page(self, url, **params):
+        return self.client.get(url, params)
+
+    def test_list_is_unpaginated_without_params(self):
+        response = self.client.get(reverse('book-list'))
+
+        self.assertEqual(len(response.data), 5)
+
+    def test_pages_follow_publish_date_and_id(self):
+        response = self.get_page(reverse('book-list'), page_size=2)
+        titles = [book['title'] for book in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [book['title'] for book in response.data['results']]
+
+        self.assertEqual(titles, [book.title for book in self.books])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_next_page_is_stable_under_inserts(self):
+        first = self.get_page(reverse('book-list'), page_size=2)
+        Book.objects.create(title='early', category=self.books[0].category, company=self.books[0].company, publish_date=self.books[0].publish_date - timedelta(days=1), user=self.user)
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([book['title'] for book in second.data['results']], ['test-2', 'test-3'])
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.get_page(reverse('book-list'), page_size=2)
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+
+        self.assertEqual(previous.data['results'], first.data['results'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_invalid_cursor(self):
+        response = self.get_page(reverse('book-list'), cursor='invalid')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ordering_is_rejected_with_pages(self):
+        response = self.get_page(reverse('book-list'), ordering='-title', page_size=2)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {'ordering'})
+        self.assertEqual(len(self.get_page(reverse('book-list'), ordering='-title').data), 5)
+
+
+class BookExportTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        company = Company.objects.create(company='test', address='test', phone='1234567890')
+        category = Category.objects.create(category='food')
+        for i in range(5):
+            Book.objects.create(title='test-%d' % i, category=category, company=company, publish_date=timezone.now(), user=self.user)
+
+    def export_books(self, output):
+        response = self.client.get(reverse('book-export'), {'output': output})
+        content = b''.join(response.streaming_content).decode()
+
+        return response, content
+
+    def get_books_serializer(self):
+        return BookSerializer(Book.objects.order_by('id'), many=True)
+
+    def test_export_ndjson(self):
+        response, content = self.export_books('ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(rows, json.loads(json.dumps(self.get_books_serializer().data)))
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+    def test_export_json_array(self):
+        response, content = self.export_books('json')
+
+        self.assertEqual(json.loads(content), json.loads(json.dumps(self.get_books_serializer().data)))
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_export_reads_in_chunks(self):
+        rows = list(iter_serialized(Book.objects.order_by('id'), BookSerializer, chunk_size=2))
+
+        self.assertEqual(rows, self.get_books_serializer().data)
+
+    def test_export_unknown_output(self):
+        response = self.client.get(reverse('book-export'), {'output': 'xml'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.anonymous_client = APIClient()
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+
+    def get_book_payload(self, title, **kwargs):
+        payload = {
+            'title': title,
+            'category': self.category.pk,
+            'company': self.company.pk,
+            'publish_date': timezone.now().isoformat(),
+            'user': self.user.pk,
+        }
+        payload.update(kwargs)
+
+        return payload
+
+    def bulk(self, client, method, basename, payload):
+        return getattr(client, method)(reverse('%s-bulk' % basename), data=json.dumps(payload), content_type='application/json')
+
+    def test_user_can_bulk_create_books(self):
+        payload = [self.get_book_payload('test-%d' % i) for i in range(20)]
+
+        with self.assertNumQueries(6):
+            response = self.bulk(self.client, 'post', 'book', payload)
+
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_bulk_create_reports_per_item_errors(self):
+        payload = [self.get_book_payload('ok'), self.get_book_payload('bad', category=self.category.pk + 100)]
+        response = self.bulk(self.client, 'post', 'book', payload)
+
+        self.assertEqual(response.data[0], {})
+        self.assertIn('category', response.data[1])
+        self.assertFalse(Book.objects.exists())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_can_bulk_update_categories(self):
+        other = Category.objects.create(category='python')
+        payload = [{'id': self.category.pk, 'category': 'a'}, {'id': other.pk, 'category': 'b'}]
+        response = self.bulk(self.client, 'patch', 'category', payload)
+
+        self.assertEqual(sorted(Category.objects.values_list('category', flat=True)), ['a', 'b'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_update_unknown_id(self):
+        payload = [{'id': self.company.pk + 100, 'company': 'a'}]
+        response = self.bulk(self.client, 'patch', 'company', payload)
+
+        self.assertEqual(response.data[0], {'id': ['Not found.']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_can_bulk_delete_companies(self):
+        other = Company.objects.create(company='other', address='test', phone='1234567890')
+        response = self.bulk(self.client, 'delete', 'company', [self.company.pk, other.pk])
+
+        self.assertFalse(Company.objects.exists())
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_anonymous_cannot_bulk_create(self):
+        response = self.bulk(self.anonymous_client, 'post', 'category', [{'category': 'a'}])
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BookExpandTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        for i in range(20):
+            company = Company.objects.create(company='test-%d' % i, address='test', phone='1234567890')
+            category = Category.objects.create(category='food-%d' % i)
+            Book.objects.create(title='test-%d' % i, category=category, company=company, publish_date=timezone.now(), user=self.user)
+
+    def test_expand_inlines_related_objects(self):
+        response = self.client.get(reverse('book-list'), {'expand': 'category,company,user'})
+        book = Book.objects.order_by('id').first()
+
+        self.assertEqual(response.data[0]['category'], CategorySerializer(book.category).data)
+        self.assertEqual(response.data[0]['company'], CompanySerializer(book.company).data)
+        self.assertEqual(response.data[0]['user'], {'id': self.user.pk, 'username': 'super'})
+
+    def test_expand_query_count_is_constant(self):
+        for page_size in (5, 20):
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse('book-list'), {'expand': 'category,company,user', 'page_size': page_size})
+
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_expand_unknown_field(self):
+        response = self.client.get(reverse('book-list'), {'expand': 'title'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResponseCacheTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.book = Book.objects.create(title='test', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+
+    def test_second_read_is_served_from_cache(self):
+        self.client.get(reverse('category-list'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('category-list'))
+
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data, CategorySerializer(Category.objects.all(), many=True).data)
+        self.assertEqual(cache_stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_string_is_part_of_key(self):
+        self.client.get(reverse('book-list'))
+        response = self.client.get(reverse('book-list'), {'expand': 'category'})
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_save_invalidates_cache(self):
+        self.client.get(reverse('company-detail', kwargs={'pk': self.company.pk}))
+        self.company.company = 'changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.company.save()
+        response = self.client.get(reverse('company-detail', kwargs={'pk': self.company.pk}))
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['company'], 'changed')
+
+    def test_invalidation_waits_for_commit(self):
+        before = get_versions([Company])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.company.save()
+        self.assertEqual(get_versions([Company]), before)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_versions([Company]), before)
+
+    def test_related_change_invalidates_book_listing(self):
+        self.client.get(reverse('book-list'), {'expand': 'category'})
+        self.category.category = 'changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        response = self.client.get(reverse('book-list'), {'expand': 'category'})
+
+        self.assertEqual(response.data[0]['category']['category'], 'changed')
+
+    def test_user_rename_invalidates_expanded_books(self):
+        self.client.get(reverse('book-list'), {'expand': 'user'})
+        self.user.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        response = self.client.get(reverse('book-list'), {'expand': 'user'})
+
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['user']['username'], 'renamed')
+
+    def test_delete_invalidates_cache(self):
+        self.client.get(reverse('book-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+        response = self.client.get(reverse('book-list'))
+
+        self.assertEqual(response.data, [])
+
+
+class ConditionalRequestTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.book = Book.objects.create(title='test', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+
+    def test_list_not_modified(self):
+        response = self.client.get(reverse('book-list'))
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(reverse('book-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_list_etag_changes_after_write(self):
+        response = self.client.get(reverse('category-list'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(category='python')
+        modified = self.client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    def test_detail_not_modified(self):
+        url = reverse('company-detail', kwargs={'pk': self.company.pk})
+        response = self.client.get(url)
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etags_change_after_user_rename(self):
+        list_url = reverse('book-list')
+        detail_url = reverse('book-detail', kwargs={'pk': self.book.pk})
+        etags = [self.client.get(url, {'expand': 'user'})['ETag'] for url in (list_url, detail_url)]
+        self.user.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        for url, etag in zip((list_url, detail_url), etags):
+            response = self.client.get(url, {'expand': 'user'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['user']['username'], 'renamed')
+
+    def update_book(self, etag):
+        return self.client.patch(reverse('book-detail', kwargs={'pk': self.book.pk}), data=json.dumps({'title': 'changed'}), content_type='application/json', HTTP_IF_MATCH=etag)
+
+    def test_update_with_matching_etag(self):
+        etag = self.client.get(reverse('book-detail', kwargs={'pk': self.book.pk}))['ETag']
+        response = self.update_book(etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_update_with_stale_etag(self):
+        etag = self.client.get(reverse('book-detail', kwargs={'pk': self.book.pk}))['ETag']
+        self.update_book(etag)
+        response = self.update_book(etag)
+
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_update_of_other_users_book_with_etag_is_not_found(self):
+        etag = self.client.get(reverse('book-detail', kwargs={'pk': self.book.pk}))['ETag']
+        other = User.objects.create_user(username='other', password='other')
+        self.client.force_authenticate(user=other)
+        url = reverse('book-detail', kwargs={'pk': self.book.pk})
+        payload = {'title': 'changed', 'category': self.category.pk, 'company': self.company.pk, 'publish_date': timezone.now().isoformat(), 'user': other.pk}
+
+        response = self.client.put(url, data=json.dumps(payload), content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, self.client.put(url, data=json.dumps(payload), content_type='application/json').data)
+
+
+class BookFilterTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.other_company = Company.objects.create(company='other', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.other_category = Category.objects.create(category='python')
+        self.now = timezone.now()
+        self.old_book = Book.objects.create(title='learning python', category=self.other_category, company=self.company, publish_date=self.now - timedelta(days=30), user=self.user)
+        self.new_book = Book.objects.create(title='cooking at home', category=self.category, company=self.other_company, publish_date=self.now, user=self.user)
+
+    def get_titles(self, **params):
+        response = self.client.get(reverse('book-list'), params)
+
+        return [book['title'] for book in response.data]
+
+    def test_filter_by_category_and_company(self):
+        self.assertEqual(self.get_titles(category=self.category.pk), ['cooking at home'])
+        self.assertEqual(self.get_titles(company=self.company.pk), ['learning python'])
+
+    def test_filter_by_publish_date(self):
+        self.assertEqual(self.get_titles(published_after=(self.now - timedelta(days=1)).date().isoformat()), ['cooking at home'])
+        self.assertEqual(self.get_titles(published_before=(self.now - timedelta(days=1)).isoformat()), ['learning python'])
+
+    def test_search_and_ordering(self):
+        self.assertEqual(self.get_titles(search='python'), ['learning python'])
+        self.assertEqual(self.get_titles(ordering='-publish_date'), ['cooking at home', 'learning python'])
+
+    def test_invalid_filter(self):
+        response = self.client.get(reverse('book-list'), {'category': 'food', 'published_after': 'yesterday'})
+
+        self.assertEqual(set(response.data), {'category', 'published_after'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_impossible_dates_are_rejected(self):
+        response = self.client.get(reverse('book-list'), {'published_after': '2020-13-45', 'published_before': '2020-01-01T25:00:00'})
+
+        self.assertEqual(set(response.data), {'published_after', 'published_before'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def explain(self, **params):
+        request = Request(APIRequestFactory().get(reverse('book-list'), params))
+        queryset = BookFilterBackend().filter_queryset(request, Book.objects.all(), None)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        return queryset.explain()
+
+    def assertUsesIndex(self, plan, name):
+        names = {name}
+        if partitions.is_partitioned(connection):
+            # Each partition gets its own copy of the index, named after the partition.
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = to_regclass(%s)', [name])
+                names.update(child for child, in cursor.fetchall())
+        self.assertTrue(any(index in plan for index in names), plan)
+
+    def test_filters_use_indexes(self):
+        self.assertUsesIndex(self.explain(category=self.category.pk), 'book_category_publish_idx')
+        self.assertUsesIndex(self.explain(company=self.company.pk, published_after=self.now.isoformat()), 'book_company_publish_idx')
+        self.assertUsesIndex(self.explain(user=self.user.pk, published_after=self.now.isoformat()), 'book_user_publish_idx')
+        self.assertUsesIndex(self.explain(published_after=self.now.isoformat()), 'book_publish_date_id_idx')
+        if connection.vendor == 'postgresql':
+            self.assertUsesIndex(self.explain(search='python'), 'book_title_search_idx')
+
+
+class StatsTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.other_company = Company.objects.create(company='other', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.other_category = Category.objects.create(category='python')
+        self.books = [
+            Book.objects.create(title='a', category=self.category, company=self.company, publish_date=timezone.make_aware(datetime(2022, 5, 3)), user=self.user),
+            Book.objects.create(title='b', category=self.category, company=self.other_company, publish_date=timezone.make_aware(datetime(2022, 5, 30)), user=self.user),
+            Book.objects.create(title='c', category=self.category, company=self.company, publish_date=timezone.make_aware(datetime(2022, 6, 1)), user=self.user),
+        ]
+
+    def get_stats(self, basename):
+        return self.client.get(reverse('%s-stats' % basename)).json()
+
+    def assertStats(self):
+        self.assertEqual(self.get_stats('category'), [
+            {'id': self.category.pk, 'category': 'food', 'books': 3},
+            {'id': self.other_category.pk, 'category': 'python', 'books': 0},
+        ])
+        self.assertEqual(self.get_stats('company'), [
+            {'id': self.company.pk, 'company': 'test', 'books': 2},
+            {'id': self.other_company.pk, 'company': 'other', 'books': 1},
+        ])
+        self.assertEqual(self.get_stats('book'), [
+            {'month': '2022-05-01', 'books': 2},
+            {'month': '2022-06-01', 'books': 1},
+        ])
+
+    def test_stats_from_aggregate_queries(self):
+        self.assertStats()
+
+    def test_book_stats_apply_filters(self):
+        response = self.client.get(reverse('book-stats'), {'company': self.other_company.pk})
+
+        self.assertEqual(response.json(), [{'month': '2022-05-01', 'books': 1}])
+
+    @override_settings(BOOK_STATS_SUMMARY=True)
+    def test_stats_from_summary_table(self):
+        rebuild_summary()
+
+        self.assertEqual(BookStat.objects.count(), 3)
+        self.assertStats()
+
+    @override_settings(BOOK_STATS_SUMMARY=True)
+    def test_summary_table_follows_writes(self):
+        rebuild_summary()
+        self.books[0].category = self.other_category
+        self.books[0].save()
+        self.books[1].delete()
+        Book.objects.create(title='d', category=self.category, company=self.company, publish_date=timezone.make_aware(datetime(2022, 5, 3)), user=self.user)
+        self.client.patch(reverse('book-bulk'), data=json.dumps([{'id': self.books[2].pk, 'company': self.other_company.pk}]), content_type='application/json')
+
+        self.assertEqual(
+            sorted(BookStat.objects.filter(books__gt=0).values_list('category', 'company', 'month', 'books')),
+            sorted(Book.objects.annotate(month=TruncMonth('publish_date', output_field=DateField())).values('category', 'company', 'month').annotate(books=Count('id')).values_list('category', 'company', 'month', 'books'))
+        )
+
+
+class StatelessAuthenticationTests(BookTestCase):
+    def setUp(self):
+        token_cache.clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com', is_staff=True)
+        self.token = StatelessJSONWebTokenAuthentication.jwt_encode_payload(jwt_create_payload(self.user))
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, method, token=None):
+        request = getattr(self.factory, method)('/api/book/', HTTP_AUTHORIZATION='Bearer %s' % (token or self.token))
+
+        return StatelessJSONWebTokenAuthentication().authenticate(Request(request))
+
+    def test_reads_trust_token_claims(self):
+        with self.assertNumQueries(0):
+            user, token = self.authenticate('get')
+
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual((user.pk, user.username, user.is_staff), (self.user.pk, 'super', True))
+
+    def test_decoded_token_is_cached(self):
+        self.authenticate('get')
+
+        self.assertIsNotNone(token_cache.get(self.token))
+
+    def test_writes_load_user(self):
+        with self.assertNumQueries(1):
+            user, token = self.authenticate('post')
+
+        self.assertEqual(user, self.user)
+
+    def test_invalid_token(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('get', token='invalid')
+
+    def test_token_cache_is_bounded(self):
+        cache = TokenCache(maxsize=2)
+        for token in ('a', 'b', 'c'):
+            cache.set(token, {'exp': time.time() + 60})
+
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_token_cache_drops_expired_tokens(self):
+        cache = TokenCache(maxsize=2)
+        cache.set('a', {'exp': time.time() - 1})
+
+        self.assertIsNone(cache.get('a'))
+
+    def test_authenticated_read_through_viewset(self):
+        response = self.client.get(reverse('book-list'), HTTP_AUTHORIZATION='Bearer %s' % self.token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BenchmarkTests(BookTestCase):
+    def test_seed_and_run(self):
+        benchmark.seed(categories=2, companies=2, books=25, users=2, batch_size=10)
+        results = benchmark.run(requests=2, concurrency=1)
+
+        self.assertEqual(Book.objects.count(), 25)
+        self.assertIn('book-list', results)
+        self.assertIn('category-detail', results)
+        self.assertFalse(any(result['errors'] for result in results.values()))
+
+    def test_compare_reports_regressions(self):
+        baseline = {'book-list': {'p99_ms': 10.0, 'queries_per_request': 1.0}}
+        results = {'book-list': {'p99_ms': 13.0, 'queries_per_request': 2.0}}
+
+        self.assertEqual(len(benchmark.compare(results, baseline, tolerance=0.2)), 2)
+        self.assertEqual(len(benchmark.compare(results, baseline, tolerance=0.5)), 1)
+
+
+def reload_urls():
+    import core.urls
+
+    importlib.reload(core.urls)
+    clear_url_caches()
+
+
+@override_settings(BOOK_PROFILING=True, MIDDLEWARE=['book.middleware.ProfilingMiddleware'] + settings.MIDDLEWARE)
+class ProfilingTests(BookTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # /metrics is only routed when profiling is on.
+        reload_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        reload_urls()
+
+    def setUp(self):
+        get_cache().clear()
+        registry.reset()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        company = Company.objects.create(company='test', address='test', phone='1234567890')
+        category = Category.objects.create(category='food')
+        Book.objects.create(title='test', category=category, company=company, publish_date=timezone.now(), user=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('book-list'))
+        timings = dict(part.strip().split(';', 1) for part in response['Server-Timing'].split(','))
+
+        self.assertEqual(set(timings), {'db', 'serializer', 'total'})
+        self.assertIn('desc="1 queries"', timings['db'])
+
+    @override_settings(BOOK_METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('book-list'))
+        self.client.get(reverse('book-list'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        content = response.content.decode()
+
+        self.assertIn('book_request_duration_seconds_count{method="GET",view="book-list"} 2', content)
+        self.assertIn('book_request_queries_bucket{method="GET",view="book-list",le="1"} 2', content)
+        self.assertIn('book_response_cache_hits_total 1', content)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4')
+
+    def test_metrics_are_restricted(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(BOOK_METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, status.HTTP_403_FORBIDDEN)
+        with override_settings(BOOK_METRICS_ALLOWED_IPS=['10.0.0.1']):
+            self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1').status_code, status.HTTP_200_OK)
+
+        self.client.force_login(User.objects.create_user(username='staff', password='staff', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+
+class AsyncReadTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.async_client = AsyncClient()
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.book = Book.objects.create(title='test', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+
+    async def test_async_list_matches_viewset(self):
+        for basename, model, serializer_class in (('book', Book, BookSerializer), ('category', Category, CategorySerializer), ('company', Company, CompanySerializer)):
+            response = await self.async_client.get(reverse('async-%s-list' % basename))
+            objs = await sync_to_async(list)(model.objects.all())
+
+            self.assertEqual(response.json(), {'next': None, 'results': json.loads(json.dumps(serializer_class(objs, many=True).data))})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_async_list_pages(self):
+        second = await sync_to_async(Book.objects.create)(title='second', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+        first_page = (await self.async_client.get(reverse('async-book-list'), {'limit': 1})).json()
+        second_page = (await self.async_client.get(first_page['next'])).json()
+
+        self.assertEqual([book['id'] for book in first_page['results']], [self.book.pk])
+        self.assertEqual([book['id'] for book in second_page['results']], [second.pk])
+        self.assertIsNone(second_page['next'])
+
+    async def test_async_list_filters(self):
+        response = await self.async_client.get(reverse('async-book-list'), {'category': self.category.pk + 100})
+        self.assertEqual(response.json()['results'], [])
+
+        response = await self.async_client.get(reverse('async-book-list'), {'published_after': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BOOK_THROTTLE_RATES={'read': '1/min'})
+    async def test_async_views_are_throttled(self):
+        responses = [await self.async_client.get(reverse('async-category-list')) for _ in range(2)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 429])
+        self.assertIn('Retry-After', responses[1])
+
+    def test_async_views_reject_invalid_tokens(self):
+        request = RequestFactory().get(reverse('async-category-list'), HTTP_AUTHORIZATION='Bearer invalid')
+
+        self.assertEqual(async_views.check_request(request).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_detail(self):
+        response = await self.async_client.get(reverse('async-book-detail', kwargs={'pk': self.book.pk}))
+
+        self.assertEqual(response.json()['title'], 'test')
+
+    async def test_async_detail_not_found(self):
+        response = await self.async_client.get(reverse('async-company-detail', kwargs={'pk': self.company.pk + 100}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'Not found.'})
+
+    async def test_async_views_are_read_only(self):
+        response = await self.async_client.post(reverse('async-category-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class FastSerializerTests(BookTestCase):
+    alphabet = 'abcXYZ 0129"\\/\n\t\x01\x7f\u00e9\u4e2d\u2028\u2029\U0001f4da'
+
+    def setUp(self):
+        get_cache().clear()
+        self.random = random.Random(1234)
+
+        self.client = APIClient()
+        self.users = [User.objects.create_user(username='user-%d' % i, password='super') for i in range(3)]
+        self.categories = [Category.objects.create(category=self.random_text(32)) for _ in range(5)]
+        self.companies = [
+            Company.objects.create(company=self.random_text(64), address=self.random_text(128), phone=self.random_text(32))
+            for _ in range(5)
+        ]
+        for _ in range(50):
+            Book.objects.create(
+                title=self.random_text(64),
+                category=self.random.choice(self.categories),
+                company=self.random.choice(self.companies),
+                publish_date=timezone.now() - timedelta(seconds=self.random.randint(0, 10 ** 8), microseconds=self.random.choice([0, self.random.randint(1, 999999)])),
+                user=self.random.choice(self.users),
+            )
+
+    def random_text(self, max_length):
+        return ''.join(self.random.choice(self.alphabet) for _ in range(self.random.randint(0, max_length)))
+
+    def test_values_serializer_matches_model_serializer(self):
+        for model, serializer_class in ((Book, BookSerializer), (Category, CategorySerializer), (Company, CompanySerializer)):
+            queryset = model.objects.order_by('id')
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+            self.assertEqual(FastJSONRenderer().render(ValuesSerializer(serializer_class).serialize(queryset)), expected)
+            self.assertEqual(JSONRenderer().render(ValuesSerializer(serializer_class).serialize(queryset)), expected)
+
+    def test_list_endpoints_are_byte_identical(self):
+        for basename, model, serializer_class in (('book', Book, BookSerializer), ('category', Category, CategorySerializer), ('company', Company, CompanySerializer)):
+            response = self.client.get(reverse('%s-list' % basename))
+
+            self.assertEqual(response.content, JSONRenderer().render(serializer_class(model.objects.all(), many=True).data))
+
+    def test_renderer_falls_back_for_indent(self):
+        data = {'date': timezone.now(), 'text': self.random_text(20)}
+
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(data, 'application/json; indent=4'), JSONRenderer().render(data, 'application/json; indent=4'))
+
+    @skipUnless(orjson, 'orjson is not installed.')
+    def test_renderer_float_differences(self):
+        self.assertEqual(FastJSONRenderer().render([1e20, 1e-07, 0.5]), b'[1e20,1e-7,0.5]')
+        self.assertEqual(JSONRenderer().render([1e20, 1e-07, 0.5]), b'[1e+20,1e-07,0.5]')
+        self.assertEqual(FastJSONRenderer().render([float('nan'), float('inf')]), b'[null,null]')
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float('nan')])
+
+
+@skipUnless('replica' in settings.DATABASES, 'Needs a "replica" database alias.')
+@override_settings(BOOK_READ_REPLICAS=['replica'])
+class ReplicaRoutingTests(BookTestCase):
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        Category.objects.create(category='primary')
+        Category.objects.using('replica').create(category='replica')
+
+    def get_categories(self, client=None):
+        response = (client or self.client).get(reverse('category-stats'))
+
+        return [category['category'] for category in response.data]
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.get_categories(), ['replica'])
+
+    def test_client_reads_primary_after_writing(self):
+        self.client.post(reverse('category-list'), data=json.dumps({'category': 'new'}), content_type='application/json')
+
+        self.assertEqual(self.get_categories(), ['primary', 'new'])
+        self.assertEqual(Category.objects.using('replica').count(), 1)
+
+    def test_other_clients_keep_reading_replica(self):
+        self.client.post(reverse('category-list'), data=json.dumps({'category': 'new'}), content_type='application/json')
+
+        self.assertEqual(self.get_categories(APIClient(REMOTE_ADDR='10.0.0.1')), ['replica'])
+
+    def test_cached_and_etagged_reads_use_primary(self):
+        client = APIClient(REMOTE_ADDR='10.0.0.1')
+        response = client.get(reverse('category-list'))
+        self.assertEqual([category['category'] for category in response.data], ['primary'])
+        self.assertEqual(client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A write the replica has not caught up with yet.
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(category='new')
+        response = client.get(reverse('category-list'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual([category['category'] for category in response.data], ['primary', 'new'])
+
+        detail = client.get(reverse('category-detail', kwargs={'pk': category.pk}))
+        self.assertEqual(detail.data['category'], 'new')
+        self.assertIn('ETag', detail)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Category))
+        self.assertEqual(list(Category.objects.values_list('category', flat=True)), ['primary'])
+
+
+class ImportBooksTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.category = Category.objects.create(category='novel')
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'books.csv')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_rows(self, rows):
+        with open(self.path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'category', 'company', 'publish_date', 'user', 'address', 'phone'])
+            writer.writerows(rows)
+
+    def import_books(self, *args):
+        call_command('import_books', self.path, *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_import_creates_books_and_missing_names(self):
+        self.write_rows([
+            ['first', 'novel', 'acme', '2022-01-01', 'super', 'road 1', '0912345678'],
+            ['second', 'poetry', 'acme', '2022-02-01T10:00:00', str(self.user.id), '', ''],
+        ])
+        self.import_books('--chunk-size', '1')
+
+        self.assertEqual(Book.objects.count(), 2)
+        self.assertEqual(Category.objects.count(), 2)
+        self.assertEqual(Book.objects.get(title='first').category, self.category)
+        self.assertEqual(Company.objects.get().address, 'road 1')
+        self.assertEqual(set(Book.objects.values_list('user_id', flat=True)), {self.user.id})
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_import_resumes_from_checkpoint(self):
+        self.write_rows([
+            ['first', 'novel', 'acme', '2022-01-01', 'super', '', ''],
+            ['second', 'novel', 'acme', '2022-01-02', 'nobody', '', ''],
+        ])
+        with self.assertRaises(CommandError):
+            self.import_books('--chunk-size', '1')
+
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['first'])
+        with open(self.path + '.checkpoint') as f:
+            self.assertEqual(f.read(), '1')
+
+        self.write_rows([
+            ['first', 'novel', 'acme', '2022-01-01', 'super', '', ''],
+            ['second', 'novel', 'acme', '2022-01-02', 'super', '', ''],
+        ])
+        self.import_books('--chunk-size', '1', '--resume')
+
+        self.assertEqual(list(Book.objects.order_by('id').values_list('title', flat=True)), ['first', 'second'])
+
+    def test_skip_errors_reports_invalid_rows(self):
+        importer = BookImporter(skip_errors=True)
+        importer.run([
+            {'title': 'first', 'category': 'novel', 'company': 'acme', 'publish_date': 'soon', 'user': 'super'},
+            {'title': 'second', 'category': 'novel', 'company': 'acme', 'publish_date': '2022-01-01', 'user': 'super'},
+        ])
+
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([error.line for error in importer.errors], [2])
+
+    def test_names_created_concurrently_are_reused(self):
+        importer = BookImporter()
+        poetry = Category.objects.create(category='Poetry')
+        importer.run([{'title': 'first', 'category': 'poetry', 'company': 'acme', 'publish_date': '2022-01-01', 'user': 'super'}])
+
+        self.assertEqual(Book.objects.get().category, poetry)
+        self.assertEqual(Category.objects.count(), 2)
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL.')
+    @override_settings(BOOK_LISTING=True, BOOK_CHANGE_LOG=True)
+    def test_copy_import_reports_ids(self):
+        importer = BookImporter(use_copy=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.run([
+                {'title': title, 'category': 'novel', 'company': 'acme', 'publish_date': '2022-01-01', 'user': 'super'}
+                for title in ('first', 'second')
+            ])
+
+        books = dict(Book.objects.values_list('title', 'id'))
+        self.assertEqual(set(books), {'first', 'second'})
+        self.assertEqual(set(Change.objects.filter(model='book').values_list('object_id', flat=True)), set(books.values()))
+        self.assertEqual(dict(BookListing.objects.values_list('title', 'id')), books)
+
+    def test_skip_errors_reports_oversized_and_impossible_values(self):
+        row = {'title': 'book', 'category': 'novel', 'company': 'acme', 'publish_date': '2022-01-01', 'user': 'super'}
+        importer = BookImporter(skip_errors=True)
+        importer.run([
+            dict(row, category='c' * 33),
+            dict(row, company='c' * 65),
+            dict(row, company='new', address='a' * 129),
+            dict(row, company='new', phone='0' * 33),
+            dict(row, publish_date='2022-02-30'),
+            row,
+        ])
+
+        self.assertEqual(importer.imported, 1)
+        self.assertEqual([error.line for error in importer.errors], [2, 3, 4, 5, 6])
+        self.assertEqual(str(importer.errors[2]), 'Line 4: "address" is too long.')
+
+
+class NameLookupTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.category = Category.objects.create(category='Food')
+
+    def test_lookup_ignores_case(self):
+        response = self.client.get(reverse('category-lookup'), {'name': 'fOOD'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], self.category.pk)
+
+    def test_lookup_missing_name(self):
+        self.assertEqual(self.client.get(reverse('category-lookup'), {'name': 'python'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse('company-lookup')).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_names_are_unique_ignoring_case(self):
+        response = self.client.post(reverse('category-list'), data=json.dumps({'category': 'FOOD'}), content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Category.objects.create(category='food')
+
+    def test_bulk_conflicts_are_rejected(self):
+        response = self.client.post(
+            reverse('category-bulk'),
+            data=json.dumps([{'category': 'python'}, {'category': 'Python'}]),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Category.objects.count(), 1)
+
+    @override_settings(BOOK_STATS_SUMMARY=True)
+    def test_merge_duplicates_repoints_books(self):
+        first = Company.objects.create(company='first', address='Main Road', phone='1')
+        second = Company.objects.create(company='second', address='MAIN ROAD', phone='2')
+        other = Company.objects.create(company='other', address='Side Road', phone='3')
+        for company in (first, second, second, other):
+            Book.objects.create(title='book', category=self.category, company=company, publish_date=timezone.now(), user=self.user)
+        rebuild_summary()
+
+        merged = merge_duplicates(Company, 'address', Book, BookStat, batch_size=1)
+
+        self.assertEqual(merged, 1)
+        self.assertFalse(Company.objects.filter(pk=second.pk).exists())
+        self.assertEqual(Book.objects.filter(company=first).count(), 3)
+        self.assertEqual(dict(BookStat.objects.values_list('company_id', 'books')), {first.pk: 3, other.pk: 1})
+
+    def test_merge_changes_detail_etag(self):
+        first = Company.objects.create(company='first', address='Main Road', phone='1')
+        second = Company.objects.create(company='second', address='MAIN ROAD', phone='2')
+        book = Book.objects.create(title='book', category=self.category, company=second, publish_date=timezone.now(), user=self.user)
+        url = reverse('book-detail', kwargs={'pk': book.pk})
+        etag = APIClient().get(url)['ETag']
+
+        merge_duplicates(Company, 'address', Book, BookStat)
+        response = APIClient().get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(Book.objects.get(pk=book.pk).company, first)
+
+
+@override_settings(BOOK_THROTTLE_RATES={'read': '2/min', 'write': '1/min', 'token': '1/min'})
+class ThrottleTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_read_budget(self):
+        responses = [self.client.get(reverse('category-list')) for _ in range(3)]
+
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertEqual(responses[0]['X-RateLimit-Scope'], 'read')
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '2')
+        self.assertEqual([response['X-RateLimit-Remaining'] for response in responses], ['1', '0', '0'])
+        self.assertIn('Retry-After', responses[2])
+
+    def test_writes_and_users_have_separate_budgets(self):
+        payload = json.dumps({'category': 'food'})
+        self.assertEqual(self.client.post(reverse('category-list'), data=payload, content_type='application/json').status_code, 201)
+        self.assertEqual(self.client.post(reverse('category-list'), data=payload, content_type='application/json').status_code, 429)
+        self.assertEqual(self.client.get(reverse('category-list')).status_code, 200)
+
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='other', password='other'))
+        self.assertEqual(other.post(reverse('category-list'), data=json.dumps({'category': 'python'}), content_type='application/json').status_code, 201)
+
+    def test_token_issue_budget(self):
+        payload = {'username': 'super', 'password': 'super'}
+
+        self.assertEqual(APIClient().post('/api/token-auth/', payload).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(APIClient().post('/api/token-auth/', payload).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills(self):
+        store = get_store()
+        with mock.patch('book.throttling.time.time', return_value=1000.0):
+            self.assertEqual(store.consume('bucket', 2, 60)[:2], (True, 1))
+            self.assertEqual(store.consume('bucket', 2, 60)[:2], (True, 0))
+            allowed, remaining, wait = store.consume('bucket', 2, 60)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 30.0)
+
+        with mock.patch('book.throttling.time.time', return_value=1030.0):
+            self.assertTrue(store.consume('bucket', 2, 60)[0])
+
+    def test_contended_bucket_waits_then_lets_request_through(self):
+        store = get_store()
+        store.cache.add('bucket:lock', 'other', 60)
+
+        with mock.patch('book.throttling.time.sleep') as sleep, mock.patch('book.throttling.time.monotonic', side_effect=[0, 0, 0.02, 0.05, 0.2]):
+            self.assertEqual(store.consume('bucket', 2, 60), (True, 0, None))
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.001, 0.002, 0.004])
+        self.assertEqual(store.cache.get('bucket:lock'), 'other')
+        self.assertIsNone(store.cache.get('bucket'))
+
+        store.cache.delete('bucket:lock')
+        self.assertEqual(store.consume('bucket', 2, 60)[:2], (True, 1))
+        self.assertIsNone(store.cache.get('bucket:lock'))
+
+
+class SparseFieldsTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+
+        self.category = Category.objects.create(category='food')
+        company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.books = [
+            Book.objects.create(title='test-%d' % i, category=self.category, company=company, publish_date=timezone.now(), user=self.user)
+            for i in range(3)
+        ]
+
+    def get_book_queries(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            if hasattr(response, 'streaming_content'):
+                data = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+            else:
+                data = response.data
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return data, [query['sql'] for query in queries.captured_queries if 'FROM "book_book"' in query['sql']]
+
+    def test_list_selects_only_requested_columns(self):
+        data, queries = self.get_book_queries(reverse('book-list'), {'fields': 'id,title'})
+
+        self.assertEqual(data[0], {'id': self.books[0].id, 'title': 'test-0'})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"title"', queries[0])
+        self.assertNotIn('"company_id"', queries[0])
+
+    def test_paginated_list_and_detail_defer_other_columns(self):
+        data, queries = self.get_book_queries(reverse('book-list'), {'fields': 'title', 'page_size': 2})
+
+        self.assertEqual(data['results'], [{'title': 'test-0'}, {'title': 'test-1'}])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"company_id"', queries[0])
+
+        data, queries = self.get_book_queries(reverse('book-detail', kwargs={'pk': self.books[0].pk}), {'fields': 'title'})
+
+        self.assertEqual(data, {'title': 'test-0'})
+        self.assertNotIn('"company_id"', queries[-1])
+
+    def test_fields_with_expand_and_export(self):
+        response = self.client.get(reverse('book-list'), {'fields': 'id,category', 'expand': 'category,company'})
+
+        self.assertEqual(response.data[0]['category'], {'id': self.category.id, 'category': 'food'})
+        self.assertNotIn('company', response.data[0])
+
+        data, queries = self.get_book_queries(reverse('book-export'), {'fields': 'id'})
+
+        self.assertEqual(data, [{'id': book.id} for book in self.books])
+        self.assertEqual(len(queries), 1)
+
+    def test_unknown_fields(self):
+        response = self.client.get(reverse('category-list'), {'fields': 'id,secret'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class JobTests(BookTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(BOOK_TASK_BACKEND='book.jobs.ImmediateBackend', BOOK_TASK_FILES_DIR=self.directory.name)
+        self.settings.enable()
+
+        self.staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(category='food')
+        company = Company.objects.create(company='test', address='test', phone='1234567890')
+        for i in range(3):
+            Book.objects.create(title='test-%d' % i, category=category, company=company, publish_date=timezone.now(), user=self.user)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def create_job(self, client, task, payload=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('job-list'), data=json.dumps({'task': task, 'payload': payload or {}}), content_type='application/json')
+
+        return response
+
+    def test_export_job_writes_downloadable_file(self):
+        self.assertEqual(self.create_job(self.client, 'export_books').status_code, status.HTTP_400_BAD_REQUEST)
+
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        response = self.create_job(client, 'export_books', {'output': 'ndjson', 'params': {'search': 'test-1'}})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = client.get(reverse('job-detail', kwargs={'pk': response.data['id']}))
+        self.assertEqual(response.data['status'], 'succeeded')
+
+        response = client.get(reverse('job-download', kwargs={'pk': response.data['id']}))
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual([json.loads(line)['title'] for line in content.splitlines()], ['test-1'])
+
+    def test_invalid_payloads_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+
+        for payload in ({'chunk_size': 0}, {'output': 'xml'}, {'params': 'search'}):
+            response = self.create_job(client, 'export_books', payload)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(payload)), response.data['payload'])
+        self.assertEqual(self.create_job(client, 'import_books').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+        response = self.create_job(client, 'rebuild_book_stats', {'unused': 1})
+        self.assertEqual(Job.objects.get(pk=response.data['id']).payload, {})
+
+    def test_old_exports_are_pruned(self):
+        directory = os.path.join(self.directory.name, 'exports')
+        os.makedirs(directory)
+        for name, age in (('old.ndjson', 7200), ('new.ndjson', 0)):
+            path = os.path.join(directory, name)
+            open(path, 'w').close()
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        with override_settings(BOOK_TASK_EXPORT_RETENTION_SECONDS=3600), mock.patch('book.management.commands.run_book_worker.close_old_connections'):
+            call_command('run_book_worker', '--once', stdout=StringIO())
+
+        self.assertEqual(os.listdir(directory), ['new.ndjson'])
+
+    def test_staff_only_tasks(self):
+        self.assertEqual(self.create_job(self.client, 'rebuild_book_stats').status_code, status.HTTP_400_BAD_REQUEST)
+
+        staff_client = APIClient()
+        staff_client.force_authenticate(user=self.staff)
+        response = self.create_job(staff_client, 'rebuild_book_stats')
+
+        self.assertEqual(Job.objects.get(pk=response.data['id']).result, {'rows': 1})
+        self.assertEqual(self.client.get(reverse('job-list')).data['results'], [])
+        self.assertEqual(len(staff_client.get(reverse('job-list')).data['results']), 1)
+
+    def test_import_upload(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        upload = SimpleUploadedFile('books.csv', b'title,category,company,publish_date,user\nnew,novel,acme,2022-01-01,staff\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('book-import'), {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Job.objects.get(pk=response.data['id']).result, {'imported': 1, 'errors': []})
+        self.assertTrue(Book.objects.filter(title='new', user=self.staff).exists())
+        self.assertEqual(self.client.post(reverse('book-import'), {}, format='multipart').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_rejects_other_paths(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        path = os.path.join(self.directory.name, 'books.csv')
+        with open(path, 'w') as f:
+            f.write('title,category,company,publish_date,user\n')
+
+        for payload_path in (path, os.path.join(self.directory.name, 'imports', '..', 'books.csv')):
+            response = self.create_job(client, 'import_books', {'path': payload_path})
+            job = Job.objects.get(pk=response.data['id'])
+            self.assertEqual(job.status, 'failed')
+            self.assertIn('Only files uploaded', job.error)
+        self.assertTrue(os.path.exists(path))
+
+    @override_settings(BOOK_TASK_BACKEND='book.jobs.DatabaseBackend')
+    def test_worker_runs_pending_jobs(self):
+        client = APIClient()
+        client.force_authenticate(user=self.staff)
+        self.create_job(client, 'import_books', {'path': os.path.join(self.directory.name, 'books.csv')})
+        self.assertEqual(Job.objects.get().status, 'pending')
+
+        # The worker recycles connections between jobs, which would close the test's transaction.
+        with mock.patch('book.management.commands.run_book_worker.close_old_connections'):
+            call_command('run_book_worker', '--once', stdout=StringIO())
+
+        job = Job.objects.get()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('Only files uploaded', job.error)
+
+    @override_settings(BOOK_TASK_BACKEND='book.jobs.DatabaseBackend', BOOK_TASK_LEASE_SECONDS=60)
+    def test_worker_reclaims_orphaned_jobs(self):
+        orphaned = Job.objects.create(task='rebuild_book_stats', status=Job.Status.RUNNING, started_at=timezone.now() - timedelta(minutes=5))
+        running = Job.objects.create(task='rebuild_book_stats', status=Job.Status.RUNNING, started_at=timezone.now())
+
+        with mock.patch('book.management.commands.run_book_worker.close_old_connections'):
+            call_command('run_book_worker', '--once', stdout=StringIO())
+
+        orphaned.refresh_from_db()
+        self.assertEqual(orphaned.status, 'succeeded')
+        self.assertEqual(Job.objects.get(pk=running.pk).status, 'running')
+
+
+@override_settings(BOOK_LISTING=True)
+class BookListingTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.category = Category.objects.create(category='food')
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        for i in range(3):
+            Book.objects.create(title='test-%d' % i, category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+
+    def get_list(self, params):
+        get_cache().clear()
+        response = self.client.get(reverse('book-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return json.loads(response.content)
+
+    def test_expanded_list_matches_and_reads_one_table(self):
+        params = {'expand': 'category,company,user', 'page_size': 2}
+        with override_settings(BOOK_LISTING=False):
+            expected = self.get_list(params)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get_list(params)
+
+        self.assertEqual(data, expected)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"book_booklisting"', queries[0]['sql'])
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        self.assertEqual(self.get_list({'expand': 'company', 'fields': 'id,company', 'category': self.category.pk})[0], {
+            'id': data['results'][0]['id'],
+            'company': {'id': self.company.pk, 'company': 'test', 'address': 'test', 'phone': '1234567890'},
+        })
+
+    def test_merged_books_are_relisted(self):
+        duplicate = Company.objects.create(company='duplicate', address='TEST', phone='1')
+        book = Book.objects.create(title='moved', category=self.category, company=duplicate, publish_date=timezone.now(), user=self.user)
+
+        merge_duplicates(Company, 'address', Book, BookStat, on_repoint=MergeDuplicateNames().books_repointed)
+
+        self.assertEqual(BookListing.objects.get(pk=book.pk).company_id, self.company.pk)
+        self.assertEqual(BookListing.objects.get(pk=book.pk).company_name, 'test')
+
+    def test_listing_follows_writes(self):
+        self.category.category = 'drinks'
+        self.category.save()
+        self.user.username = 'renamed'
+        self.user.save()
+        self.client.post(
+            reverse('book-bulk'),
+            data=json.dumps([{'title': 'bulk', 'category': self.category.pk, 'company': self.company.pk, 'publish_date': '2022-01-01T00:00:00Z', 'user': self.user.pk}]),
+            content_type='application/json'
+        )
+        Book.objects.filter(title='test-0').delete()
+
+        self.assertEqual(
+            sorted(BookListing.objects.values_list('title', 'category_name', 'username')),
+            [('bulk', 'drinks', 'renamed'), ('test-1', 'drinks', 'renamed'), ('test-2', 'drinks', 'renamed')]
+        )
+
+    def test_mine_reads_listing_by_user_index(self):
+        other = User.objects.create_user(username='other', password='other')
+        Book.objects.create(title='other', category=self.category, company=self.company, publish_date=timezone.now(), user=other)
+        response = self.client.get(reverse('book-mine'), {'expand': 'user'})
+        self.assertEqual([book['user']['username'] for book in response.data], ['super'] * 3)
+
+        view = BookViewSet(action='mine', format_kwarg=None)
+        view.request = Request(APIRequestFactory().get(reverse('book-mine'), {'expand': 'user'}))
+        view.request.user = self.user
+        queryset = view.filter_queryset(view.get_queryset()).order_by('publish_date', 'id')
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        self.assertIs(queryset.model, BookListing)
+        plan = queryset.explain()
+        self.assertIn('listing_user_publish_idx', plan, plan)
+
+    def test_rebuild_command(self):
+        BookListing.objects.all().delete()
+        call_command('rebuild_book_listing', stdout=StringIO())
+
+        self.assertEqual(BookListing.objects.count(), 3)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning needs PostgreSQL.')
+@override_settings(BOOK_PARTITION_INTERVAL='month')
+class PartitionTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.category = Category.objects.create(category='food')
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        for title, month in (('january', 1), ('march', 3)):
+            Book.objects.create(
+                title=title, category=self.category, company=self.company,
+                publish_date=timezone.make_aware(datetime(2022, month, 15)), user=self.user
+            )
+        with connection.cursor() as cursor:
+            # Table DDL refuses to run while deferred FK checks are pending.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        with connection.schema_editor() as schema_editor:
+            if partitions.is_partitioned(connection):
+                partitions.ensure_partitions(schema_editor, date(2022, 1, 1), partitions.periods_ahead(1, 'month'), 'month')
+            else:
+                partitions.partition_table(schema_editor, Book, 'month', ahead=1)
+
+    def create_book(self, publish_date):
+        book = Book.objects.create(title='new', category=self.category, company=self.company, publish_date=publish_date, user=self.user)
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        return book
+
+    def partition_of(self, book):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM book_book WHERE id = %s', [book.pk])
+            return cursor.fetchone()[0]
+
+    def test_rows_are_moved_into_partitions(self):
+        self.assertTrue(partitions.is_partitioned(connection))
+        self.assertTrue({'book_book_default', 'book_book_p2022_01', 'book_book_p2022_02', 'book_book_p2022_03'} <= partitions.existing_partitions(connection))
+        self.assertEqual(self.partition_of(Book.objects.get(title='march')), 'book_book_p2022_03')
+
+        previous = Book.objects.order_by('-id').first()
+        book = self.create_book(timezone.make_aware(datetime(2022, 2, 1)))
+        self.assertGreater(book.pk, previous.pk)
+        self.assertEqual(self.partition_of(book), 'book_book_p2022_02')
+
+    def test_date_filter_prunes_partitions(self):
+        request = Request(APIRequestFactory().get(reverse('book-list'), {
+            'published_after': '2022-03-01T00:00:00Z', 'published_before': '2022-03-31T00:00:00Z'
+        }))
+        plan = BookFilterBackend().filter_queryset(request, Book.objects.all(), None).explain()
+
+        self.assertIn('book_book_p2022_03', plan)
+        self.assertNotIn('book_book_p2022_01', plan)
+        self.assertNotIn('book_book_default', plan)
+
+    def test_command_creates_future_partitions(self):
+        future = timezone.now().replace(day=1) + timedelta(days=5 * 31)
+        book = self.create_book(future)
+        self.assertEqual(self.partition_of(book), 'book_book_default')
+
+        call_command('create_book_partitions', '--ahead', '6', stdout=StringIO())
+
+        self.assertEqual(self.partition_of(book), partitions.partition_name(future.date(), 'month'))
+        self.assertIn(partitions.partition_name(partitions.periods_ahead(6, 'month'), 'month'), partitions.existing_partitions(connection))
+
+
+@override_settings(BOOK_CHANGES_LAG_SECONDS=0)
+class ChangeFeedTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(category='food')
+            self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+
+    def get_changes(self, **params):
+        response = self.client.get(reverse('change-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def test_writes_are_logged_in_order_with_tombstones(self):
+        since = self.get_changes()['since']
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.create(title='a', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+        book_id = book.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('category-detail', args=[self.category.pk]), {'category': 'cooking'})
+        with self.captureOnCommitCallbacks(execute=True):
+            book.delete()
+
+        data = self.get_changes(since=since)
+        changes = [(change['model'], change['id'], change['action']) for change in data['results']]
+
+        self.assertEqual(changes, [
+            ('book', book_id, 'created'),
+            ('category', self.category.pk, 'updated'),
+            ('book', book_id, 'deleted'),
+        ])
+        self.assertEqual(data['results'][1]['data'], {'id': self.category.pk, 'category': 'cooking'})
+        self.assertIsNone(data['results'][0]['data'])
+        self.assertIsNone(data['results'][2]['data'])
+        self.assertEqual(data['since'], data['results'][-1]['seq'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual(self.get_changes(since=data['since'])['results'], [])
+
+    def test_merged_books_are_logged(self):
+        duplicate = Company.objects.create(company='duplicate', address='TEST', phone='1')
+        book = Book.objects.create(title='moved', category=self.category, company=duplicate, publish_date=timezone.now(), user=self.user)
+        since = self.get_changes()['since']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_duplicates(Company, 'address', Book, BookStat, on_repoint=MergeDuplicateNames().books_repointed)
+
+        results = self.get_changes(since=since)['results']
+        self.assertEqual([(change['model'], change['id'], change['action']) for change in results], [
+            ('book', book.pk, 'updated'),
+            ('company', duplicate.pk, 'deleted'),
+        ])
+        self.assertEqual(results[0]['data']['company'], self.company.pk)
+
+    def test_bulk_writes_are_logged_in_bounded_batches(self):
+        payload = [
+            {'title': str(i), 'category': self.category.pk, 'company': self.company.pk, 'publish_date': timezone.now().isoformat(), 'user': self.user.pk}
+            for i in range(5)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('book-bulk'), data=json.dumps(payload), content_type='application/json')
+
+        first = self.get_changes(limit=4)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.get_changes(since=first['since'], limit=4)
+
+        self.assertEqual(len(first['results']), 4)
+        self.assertTrue(first['has_more'])
+        self.assertEqual([change['data']['title'] for change in second['results']], ['2', '3', '4'])
+        self.assertFalse(second['has_more'])
+        # The change rows plus one query for the books they point at.
+        self.assertEqual(len(queries), 2)
+
+    def test_recent_changes_are_held_back(self):
+        with override_settings(BOOK_CHANGES_LAG_SECONDS=60):
+            self.assertEqual(self.get_changes()['results'], [])
+            self.assertEqual(self.get_changes()['since'], 0)
+
+        self.assertEqual(len(self.get_changes()['results']), 2)
+
+    def test_invalid_since(self):
+        response = self.client.get(reverse('change-list'), {'since': 'yesterday'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EventStreamTests(BookTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='super', password='super', email='abc@xyz.com')
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.other_category = Category.objects.create(category='python')
+        self.app = EventStreamApp(None)
+
+    def create_book(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Book.objects.create(title='a', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+
+    async def wait_until(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_stream_pushes_matching_changes(self):
+        food = benchmark.IdleConnection(self.app, 'category=%d' % self.category.pk, record=True)
+        other = benchmark.IdleConnection(self.app, 'category=%d' % self.other_category.pk, record=True)
+        await self.wait_until(lambda: len(broker.subscriptions) == 2)
+
+        book = await sync_to_async(self.create_book)()
+        await self.wait_until(lambda: food.events)
+        await food.close()
+        await other.close()
+
+        event, data = food.body.split(b'\n\n')[1].split(b'\n')
+        self.assertEqual(event, b'event: book')
+        self.assertEqual(json.loads(data[len(b'data: '):])['data']['id'], book.pk)
+        self.assertEqual(other.events, 0)
+        self.assertEqual(food.status, status.HTTP_200_OK)
+        self.assertEqual(len(broker.subscriptions), 0)
+
+    async def test_invalid_filter(self):
+        connection = benchmark.IdleConnection(self.app, 'category=food', record=True)
+        await connection.task
+
+        self.assertIn(b'category', connection.body)
+        self.assertEqual(connection.status, status.HTTP_400_BAD_REQUEST)
+
+    async def test_slow_subscribers_are_dropped(self):
+        subscription = broker.subscribe(maxsize=2)
+        for _ in range(3):
+            subscription.put(b'event')
+        broker.unsubscribe(subscription)
+
+        self.assertTrue(subscription.closed)
+        self.assertIsNone(await subscription.queue.get())
+
+    @override_settings(BOOK_CHANGES_LAG_SECONDS=0)
+    def test_change_log_backend_publishes_new_changes(self):
+        backend = ChangeLogBackend()
+        backend.fetch()
+        book = self.create_book()
+
+        with mock.patch.object(broker, 'subscriptions', {mock.sentinel.subscription}):
+            events = backend.fetch()
+
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0].category, events[0].company), (self.category.pk, self.company.pk))
+        self.assertTrue(events[0].message.startswith(b'id: %d\nevent: book\n' % backend.last_seq))
+        self.assertIn(b'"id":%d' % book.pk, events[0].message)
+
+    def test_idle_stream_benchmark(self):
+        result = benchmark.run_idle_streams(connections=20, events=2)
+
+        self.assertEqual(result['connections'], 20)
+        self.assertGreater(result['kb_per_connection'], 0)
+
+
+class BookOwnershipTests(BookTestCase):
+    def setUp(self):
+        get_cache().clear()
+
+        self.user = User.objects.create_user(username='owner', password='owner')
+        self.other = User.objects.create_user(username='other', password='other')
+        self.staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.company = Company.objects.create(company='test', address='test', phone='1234567890')
+        self.category = Category.objects.create(category='food')
+        self.book = Book.objects.create(title='mine', category=self.category, company=self.company, publish_date=timezone.now(), user=self.user)
+        self.other_book = Book.objects.create(title='theirs', category=self.category, company=self.company, publish_date=timezone.now(), user=self.other)
+
+    def test_mine_lists_own_books(self):
+        response = self.client.get(reverse('book-mine'))
+
+        self.assertEqual([book['title'] for book in response.data], ['mine'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_mine_etag_is_per_user(self):
+        response = self.client.get(reverse('book-mine'))
+        etag = response['ETag']
+        self.assertIn('Authorization', response['Vary'])
+        self.assertEqual(self.client.get(reverse('book-mine'), HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        other = APIClient()
+        other.force_authenticate(user=self.other)
+        response = other.get(reverse('book-mine'), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book['title'] for book in response.data], ['theirs'])
+
+    def test_mine_needs_authentication(self):
+        response = APIClient().get(reverse('book-mine'))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_filter_by_user(self):
+        response = self.client.get(reverse('book-list'), {'user': self.other.pk})
+
+        self.assertEqual([book['title'] for book in response.data], ['theirs'])
+
+    def test_cannot_change_other_users_books(self):
+        detail = reverse('book-detail', args=[self.other_book.pk])
+
+        self.assertEqual(self.client.patch(detail, {'title': 'stolen'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(detail).status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.patch(reverse('book-bulk'), data=json.dumps([{'id': self.other_book.pk, 'title': 'stolen'}]), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Book.objects.get(pk=self.other_book.pk).title, 'theirs')
+
+        self.assertEqual(self.client.patch(reverse('book-detail', args=[self.book.pk]), {'title': 'renamed'}).status_code, status.HTTP_200_OK)
+
+    def test_cannot_assign_books_to_other_users(self):
+        payload = {'title': 'gift', 'category': self.category.pk, 'company': self.company.pk, 'publish_date': timezone.now().isoformat(), 'user': self.other.pk}
+        response = self.client.post(reverse('book-list'), payload)
+
+        self.assertIn('user', response.data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_can_change_every_book(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.patch(reverse('book-detail', args=[self.other_book.pk]), {'title': 'moderated'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
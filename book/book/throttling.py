@@ -0,0 +1,124 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from book.cache import KEY_PREFIX
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse ``'<requests>/<period>'`` the way DRF does (``'100/min'``,
+    ``'10/s'``) into ``(capacity, seconds)``. Empty rates disable the scope.
+    """
+    if not rate:
+        return None
+    requests, period = rate.split('/')
+
+    return int(requests), PERIODS[period[0]]
+
+
+class TokenBucketStore:
+    """
+    Token buckets kept in a Django cache as ``(tokens, timestamp)`` pairs.
+
+    Each update holds a short lock taken with ``cache.add``, which is atomic
+    on locmem, memcached, the database cache and Redis, so concurrent
+    workers sharing the cache never spend the same token twice. Waiters back
+    off exponentially for up to ``lock_wait`` seconds; past that the request
+    is let through, since a burst from one client that still has tokens
+    should not see 429s just because its requests queue on the lock. A
+    worker only releases a lock that still holds its own token.
+    """
+    lock_timeout = 1
+    lock_wait = 0.1
+    max_backoff = 0.01
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, period):
+        """Take one token. Returns ``(allowed, remaining, wait_seconds)``."""
+        refill = capacity / period
+        lock_key = '%s:lock' % key
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_wait
+        backoff = 0.001
+        while not self.cache.add(lock_key, owner, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return True, 0, None
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+        try:
+            now = time.time()
+            tokens, updated = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), int(period) + 1)
+        finally:
+            # The lock expires after lock_timeout, so another worker may hold it now.
+            if self.cache.get(lock_key) == owner:
+                self.cache.delete(lock_key)
+
+        return allowed, int(tokens), None if allowed else (1 - tokens) / refill
+
+
+def get_store():
+    return TokenBucketStore(getattr(settings, 'BOOK_THROTTLE_CACHE_ALIAS', 'default'))
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle keyed by user id for authenticated requests and by
+    client IP otherwise. Budgets come from ``BOOK_THROTTLE_RATES[scope]``;
+    a rate of ``'100/min'`` allows bursts of 100 requests refilled at 100
+    per minute. The last bucket checked is reported on the request for
+    ``RateLimitHeadersMiddleware``.
+    """
+    scope = None
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_cache_key(self, request, scope):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = 'user:%s' % user.pk
+        else:
+            ident = 'ip:%s' % self.get_ident(request)
+
+        return '%s:throttle:%s:%s' % (KEY_PREFIX, scope, ident)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = parse_rate(getattr(settings, 'BOOK_THROTTLE_RATES', {}).get(scope))
+        if rate is None:
+            return True
+
+        capacity, period = rate
+        allowed, remaining, self.wait_seconds = get_store().consume(self.get_cache_key(request, scope), capacity, period)
+        request._request.rate_limit = (scope, capacity, remaining)
+
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ReadWriteThrottle(TokenBucketThrottle):
+    """Separate budgets for safe-method reads and for writes."""
+    def get_scope(self, request, view):
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+
+class TokenIssueThrottle(TokenBucketThrottle):
+    scope = 'token'
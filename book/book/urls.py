@@ -1,14 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from book.views import BookViewSet, CategoryViewSet, CompanyViewSet
+from book import async_views
+from book.views import BookViewSet, CategoryViewSet, ChangeViewSet, CompanyViewSet, JobViewSet
 
 
 router = DefaultRouter()
 router.register(r'book', BookViewSet, basename='book')
 router.register(r'category', CategoryViewSet, basename='category')
 router.register(r'company', CompanyViewSet, basename='company')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'changes', ChangeViewSet, basename='change')
 
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+
+    path('async/book/', async_views.book_list, name='async-book-list'),
+    path('async/book/<int:pk>/', async_views.book_detail, name='async-book-detail'),
+    path('async/category/', async_views.category_list, name='async-category-list'),
+    path('async/category/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('async/company/', async_views.company_list, name='async-company-list'),
+    path('async/company/<int:pk>/', async_views.company_detail, name='async-company-detail'),
 ]
\ No newline at end of file
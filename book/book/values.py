@@ -0,0 +1,62 @@
+from rest_framework import serializers
+
+from book.profiling import serializer_timer
+
+
+class ValuesSerializer:
+    """
+    Read-only counterpart of a ``ModelSerializer`` that builds dicts straight
+    from ``QuerySet.values_list()`` rows.
+
+    The field plan (output names, columns and per-column conversions) is
+    worked out once from the serializer's fields, or the subset of them in
+    ``fields``, so only those columns are selected. Columns whose DB value
+    already equals DRF's representation are copied as-is; the others go
+    through the DRF field's own ``to_representation`` so the output is the
+    same as the serializer's.
+    """
+    passthrough_fields = (
+        serializers.CharField,
+        serializers.IntegerField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+
+        names, columns, converters = [], [], []
+        for index, (name, field) in enumerate(
+            (name, field) for name, field in serializer.fields.items()
+            if not field.write_only and (fields is None or name in fields)
+        ):
+            if field.source == '*' or '.' in field.source:
+                raise ValueError('%s.%s cannot be read from a single column.' % (serializer_class.__name__, name))
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+                raise ValueError('%s.%s uses a custom pk_field.' % (serializer_class.__name__, name))
+
+            names.append(name)
+            columns.append(model._meta.get_field(field.source).attname)
+            if not isinstance(field, self.passthrough_fields):
+                converters.append((index, field.to_representation))
+
+        self.names = tuple(names)
+        self.columns = tuple(columns)
+        self.converters = tuple(converters)
+
+    def serialize(self, queryset):
+        rows = list(queryset.values_list(*self.columns))
+
+        with serializer_timer():
+            if not self.converters:
+                return [dict(zip(self.names, row)) for row in rows]
+
+            data = []
+            for row in rows:
+                row = list(row)
+                for index, convert in self.converters:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+                data.append(dict(zip(self.names, row)))
+
+            return data
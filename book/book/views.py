@@ -1,27 +1,226 @@
-from rest_framework import permissions, viewsets
+import os
+import uuid
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from rest_framework import mixins, permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
 from django.contrib.auth.models import User
+from django.utils.crypto import constant_time_compare
 
-from book.models import Book, Category, Company
-from book.serializers import BookSerializer, CategorySerializer, CompanySerializer, UserSerializer
+from book.authentication import StatelessJSONWebTokenAuthentication
+from book.cache import CachedResponseMixin
+from book.changes import serialize_changes, visible_changes
+from book.conditional import ConditionalRequestMixin
+from book.exports import iter_serialized, json_array_stream, ndjson_stream
+from book.filters import BookFilterBackend
+from book.listing import listing_enabled
+from book.jobs import enqueue
+from book.mixins import BulkModelMixin, NameLookupMixin, SparseFieldsMixin, ValuesListMixin
+from book.models import Book, BookListing, Category, Change, Company, Job
+from book.pagination import ChangePagination, JobPagination, KeysetPagination
+from book.profiling import registry
+from book.stats import books_per_category, books_per_company, books_per_month, summary_enabled
+from book.serializers import BookListingSerializer, BookSerializer, CategorySerializer, CompanySerializer, JobSerializer, UserSerializer
+from book.tasks import task_path
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ConditionalRequestMixin, CachedResponseMixin, BulkModelMixin, SparseFieldsMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    authentication_classes = [StatelessJSONWebTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    cache_dependencies = (Book, Category, Company, User)
+    filter_backends = [BookFilterBackend, OrderingFilter]
+    ordering_fields = ('id', 'title', 'publish_date')
+    sparse_required_fields = ('publish_date',)
+    user_scoped_actions = ('mine',)
+    export_chunk_size = 2000
+    export_formats = {
+        'ndjson': (ndjson_stream, 'application/x-ndjson'),
+        'json': (json_array_stream, 'application/json'),
+    }
+
+    def get_expand(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return []
+
+        expand = [name for name in request.query_params.get('expand', '').split(',') if name]
+        unknown = set(expand) - set(BookSerializer.expandable_fields)
+        if unknown:
+            raise ValidationError({'expand': 'Unknown fields: %s.' % ', '.join(sorted(unknown))})
+
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            expand = [name for name in expand if name in fields]
+
+        return expand
+
+    def use_listing(self):
+        """Expanded lists are read from the denormalized BookListing table when it is maintained."""
+        return listing_enabled() and self.action in ('list', 'mine') and bool(self.get_expand())
+
+    def get_values_serializer(self):
+        if self.get_expand():
+            return None
+
+        return super().get_values_serializer()
+
+    def get_serializer_class(self):
+        if self.use_listing():
+            return BookListingSerializer
+
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        listing = self.use_listing()
+        queryset = BookListing.objects.all() if listing else super().get_queryset()
+        request = getattr(self, 'request', None)
+        if request is not None and (self.action == 'mine' or (request.method not in permissions.SAFE_METHODS and not request.user.is_staff)):
+            # Writes only ever see the caller's own books, so someone else's is a 404 without a separate ownership check.
+            queryset = queryset.filter(user_id=request.user.pk)
+        expand = self.get_expand()
+        if expand and not listing:
+            queryset = queryset.select_related(*expand)
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+
+        return context
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def mine(self, request, *args, **kwargs):
+        """The caller's books, with the same filters, expansion and pagination as the list."""
+        return self.list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        try:
+            stream, content_type = self.export_formats[output]
+        except KeyError:
+            raise ValidationError({'output': 'Must be one of: %s.' % ', '.join(self.export_formats)})
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by('id')
+        rows = iter_serialized(queryset, self.get_serializer_class(), self.export_chunk_size, self.get_serializer_context())
+        response = StreamingHttpResponse(stream(rows), content_type=content_type)
+        response['Content-Disposition'] = 'attachment; filename="books.%s"' % output
+
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', url_name='import', parser_classes=[MultiPartParser], permission_classes=[permissions.IsAdminUser])
+    def import_file(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': 'A CSV or XLSX file is required.'})
+        extension = os.path.splitext(upload.name)[1].lower()
+        if extension not in ('.csv', '.xlsx', '.xlsm'):
+            raise ValidationError({'file': 'Only .csv and .xlsx files are supported.'})
+
+        path = task_path('imports', '%s%s' % (uuid.uuid4().hex, extension))
+        with open(path, 'wb') as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        job = enqueue('import_books', {'path': path, 'skip_errors': request.data.get('skip_errors') in ('1', 'true')}, request.user)
+
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        if summary_enabled() and not request.query_params:
+            return Response(books_per_month())
 
-class CategoryViewSet(viewsets.ModelViewSet):
+        return Response(books_per_month(self.filter_queryset(self.get_queryset())))
+
+
+class CategoryViewSet(ConditionalRequestMixin, CachedResponseMixin, BulkModelMixin, NameLookupMixin, SparseFieldsMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    authentication_classes = [StatelessJSONWebTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    name_field = 'category'
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(books_per_category())
 
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(ConditionalRequestMixin, CachedResponseMixin, BulkModelMixin, NameLookupMixin, SparseFieldsMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
+    authentication_classes = [StatelessJSONWebTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    name_field = 'company'
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        return Response(books_per_company())
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Background jobs. POST ``{"task": ..., "payload": {...}}`` queues one and
+    answers 202; poll the job until it has succeeded or failed. Users see
+    their own jobs, staff see all of them.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    authentication_classes = [StatelessJSONWebTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = JobPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user_id=self.request.user.pk)
+
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue(serializer.validated_data['task'], serializer.validated_data.get('payload'), request.user)
+
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        path = (job.result or {}).get('file') if job.status == Job.Status.SUCCEEDED else None
+        if path is None or not os.path.exists(path):
+            raise Http404
+
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
+
+
+class ChangeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Incremental sync feed: ``GET /api/changes/?since=<seq>`` returns the
+    book, category and company writes after ``seq`` in order, each with the
+    object's current representation, or ``data: null`` for deletes.
+    """
+    queryset = Change.objects.all()
+    authentication_classes = [StatelessJSONWebTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = ChangePagination
+
+    def get_queryset(self):
+        return visible_changes()
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+
+        return self.get_paginated_response(serialize_changes(page))
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -36,4 +235,20 @@ class UserViewSet(viewsets.ModelViewSet):
         try:
             return [permission() for permission in self.permission_classes_by_cation]
         except KeyError:
-            return [permission() for permission in self.permission_classes]
\ No newline at end of file
+            return [permission() for permission in self.permission_classes]
+
+
+def metrics_allowed(request):
+    if request.user.is_staff or request.META.get('REMOTE_ADDR') in getattr(settings, 'BOOK_METRICS_ALLOWED_IPS', ()):
+        return True
+    token = getattr(settings, 'BOOK_METRICS_TOKEN', '')
+
+    return bool(token) and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer %s' % token)
+
+
+def metrics(request):
+    """Prometheus metrics, for logged-in staff, ``BOOK_METRICS_TOKEN`` bearers and ``BOOK_METRICS_ALLOWED_IPS``."""
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Persistent connections leak one connection per thread under ASGI; see the
+# database settings.
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from book.events import EventStreamApp  # noqa: E402 (needs the app registry)
+
+application = EventStreamApp(django_application)
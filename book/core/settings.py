@@ -57,8 +57,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'book.middleware.ReplicaRoutingMiddleware',
+    'book.middleware.RateLimitHeadersMiddleware',
 ]
 
+# Per-request SQL, serializer and total timings, exported at /metrics and in
+# the Server-Timing header.
+BOOK_PROFILING = env.bool('BOOK_PROFILING', default=False)
+if BOOK_PROFILING:
+    MIDDLEWARE.insert(0, 'book.middleware.ProfilingMiddleware')
+# /metrics answers logged-in staff, scrapers sending "Authorization: Bearer
+# <BOOK_METRICS_TOKEN>" and the listed addresses. Behind a reverse proxy every
+# request comes from the proxy's address, so only list addresses that reach
+# the app directly.
+BOOK_METRICS_TOKEN = env.str('BOOK_METRICS_TOKEN', default='')
+BOOK_METRICS_ALLOWED_IPS = env.list('BOOK_METRICS_ALLOWED_IPS', default=[])
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -85,7 +99,7 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': env('DATABASE_NAME'),
         'USER': env('DATABASE_USER'),
         'PASSWORD': env('DATABASE_PASSWORD'),
@@ -94,6 +108,91 @@ DATABASES = {
     }
 }
 
+# Read replicas, as a comma-separated list of database URLs. Safe-method
+# requests read book models from them; see book.routers.ReplicaRouter.
+for index, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[])):
+    DATABASES['replica' if index == 0 else 'replica_%d' % (index + 1)] = env.db_url_config(url)
+
+# Persistent connections: keep each worker's connection open for
+# DATABASE_CONN_MAX_AGE seconds (0 closes it after every request) and check
+# it is still usable before reusing it (Django 4.1+). Under ASGI each request
+# may run its queries on a different thread, and every thread keeps its own
+# connection, so core/asgi.py defaults DATABASE_CONN_MAX_AGE to 0; use
+# DATABASE_POOL there instead.
+#
+# DATABASE_POOL switches to an in-process psycopg connection pool instead,
+# which needs Django 5.1+ and psycopg 3; persistent connections are then
+# always turned off because the pool owns connection reuse.
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = env.int('DATABASE_CONN_MAX_AGE', default=60)
+    database['CONN_HEALTH_CHECKS'] = env.bool('DATABASE_CONN_HEALTH_CHECKS', default=True)
+    if env.bool('DATABASE_POOL', default=False):
+        database['CONN_MAX_AGE'] = 0
+        database.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            'timeout': env.int('DATABASE_POOL_TIMEOUT', default=10),
+        }
+
+DATABASE_ROUTERS = ['book.routers.ReplicaRouter']
+
+BOOK_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# How long a client reads from the primary after writing.
+BOOK_REPLICA_PIN_SECONDS = env.int('BOOK_REPLICA_PIN_SECONDS', default=5)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+BOOK_CACHE_TIMEOUT = env.int('BOOK_CACHE_TIMEOUT', default=300)
+
+# Serve the stats endpoints from the BookStat summary table, which is kept up
+# to date by Book signals. Run `manage.py rebuild_book_stats` after enabling.
+BOOK_STATS_SUMMARY = env.bool('BOOK_STATS_SUMMARY', default=False)
+
+# Keep the denormalized BookListing table in sync with book, category, company
+# and user writes, and serve expanded book lists from it. Run
+# `manage.py rebuild_book_listing` after enabling.
+BOOK_LISTING = env.bool('BOOK_LISTING', default=False)
+
+# Range-partition book_book on publish_date by 'month' or 'year' when
+# migrating on PostgreSQL (empty leaves it a plain table). Schedule
+# `manage.py create_book_partitions` to add partitions ahead of time.
+BOOK_PARTITION_INTERVAL = env('BOOK_PARTITION_INTERVAL', default='')
+
+# Log book, category and company writes for the /api/changes/ sync feed.
+# The feed holds back changes younger than BOOK_CHANGES_LAG_SECONDS so ones
+# committed out of order are never skipped.
+BOOK_CHANGE_LOG = env.bool('BOOK_CHANGE_LOG', default=True)
+BOOK_CHANGES_LAG_SECONDS = env.float('BOOK_CHANGES_LAG_SECONDS', default=1)
+
+# Server-sent events at /api/events/ (ASGI only). 'book.events.LocalBackend'
+# pushes writes made by the same process; with several processes use
+# 'book.events.ChangeLogBackend', which tails the change log every
+# BOOK_EVENTS_POLL_SECONDS. Clients more than BOOK_EVENTS_QUEUE_SIZE events
+# behind are disconnected.
+BOOK_EVENTS_BACKEND = env('BOOK_EVENTS_BACKEND', default='book.events.LocalBackend')
+BOOK_EVENTS_POLL_SECONDS = env.float('BOOK_EVENTS_POLL_SECONDS', default=1)
+BOOK_EVENTS_KEEPALIVE_SECONDS = env.float('BOOK_EVENTS_KEEPALIVE_SECONDS', default=15)
+BOOK_EVENTS_QUEUE_SIZE = env.int('BOOK_EVENTS_QUEUE_SIZE', default=100)
+
+# Background jobs (imports, exports, stats rebuilds). The database backend
+# leaves them for `manage.py run_book_worker`; 'book.jobs.ImmediateBackend'
+# runs them in the web process instead. Uploaded imports and generated
+# exports are written under BOOK_TASK_FILES_DIR.
+BOOK_TASK_BACKEND = env('BOOK_TASK_BACKEND', default='book.jobs.DatabaseBackend')
+BOOK_TASK_FILES_DIR = env('BOOK_TASK_FILES_DIR', default=str(BASE_DIR / 'task_files'))
+# A job still running this long after it was claimed is assumed orphaned by a
+# crashed worker and claimed again; keep it above the longest job's runtime.
+BOOK_TASK_LEASE_SECONDS = env.int('BOOK_TASK_LEASE_SECONDS', default=3600)
+# Workers delete export files older than this.
+BOOK_TASK_EXPORT_RETENTION_SECONDS = env.int('BOOK_TASK_EXPORT_RETENTION_SECONDS', default=86400)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -143,9 +242,31 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'book.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'book.throttling.ReadWriteThrottle',
+    ),
+}
+
+# Token bucket budgets per user (or per IP when anonymous), as
+# '<requests>/<s|min|hour|day>'. An empty rate turns that scope off. Buckets
+# live in the BOOK_THROTTLE_CACHE_ALIAS cache, which must be shared by all
+# workers (e.g. Redis) for the limits to hold across processes.
+BOOK_THROTTLE_RATES = {
+    'read': env('BOOK_THROTTLE_READ_RATE', default='1200/min'),
+    'write': env('BOOK_THROTTLE_WRITE_RATE', default='300/min'),
+    'token': env('BOOK_THROTTLE_TOKEN_RATE', default='20/min'),
 }
+BOOK_THROTTLE_CACHE_ALIAS = env('BOOK_THROTTLE_CACHE_ALIAS', default='default')
 
 JWT_AUTH = {
     'JWT_EXPIRATION_DELTA': timedelta(seconds=int(env('JWT_EXPIRATION_DELTA'))),
     'JWT_ALLOW_REFRESH': env('JWT_ALLOW_REFRESH'),
+    'JWT_PAYLOAD_HANDLER': 'book.authentication.jwt_create_payload',
 }
+
+# Number of decoded tokens kept by the book API's stateless JWT authentication.
+BOOK_JWT_CACHE_SIZE = env.int('BOOK_JWT_CACHE_SIZE', default=1024)
@@ -13,13 +13,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import permissions
-from rest_framework_jwt.views import obtain_jwt_token, refresh_jwt_token, verify_jwt_token
+from rest_framework_jwt.views import ObtainJSONWebTokenView, RefreshJSONWebTokenView, verify_jwt_token
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from book.throttling import TokenIssueThrottle
+from book.views import metrics
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -35,9 +39,12 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('book.urls')),
 
-    path('api/token-auth/', obtain_jwt_token),
-    path('api/token-refresh/', refresh_jwt_token),
+    path('api/token-auth/', ObtainJSONWebTokenView.as_view(throttle_classes=[TokenIssueThrottle])),
+    path('api/token-refresh/', RefreshJSONWebTokenView.as_view(throttle_classes=[TokenIssueThrottle])),
     path('api/token-verify/', verify_jwt_token),
 ]
 
+if settings.BOOK_PROFILING:
+    urlpatterns.append(path('metrics', metrics, name='metrics'))
+
 urlpatterns.append(path('docs/', schema_view.with_ui(), name='docs'))
\ No newline at end of file